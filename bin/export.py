@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Export
+
+Dieses Skript exportiert die gespeicherten Lehrgänge oder die archivierten
+Benachrichtigungen als CSV oder NDJSON, z.B. für die Jahresberichte. Die Daten
+werden datensatzweise gelesen und geschrieben, der Speicherbedarf bleibt daher
+auch bei großen Datenbeständen konstant.
+
+Beispiele:
+    python bin/export.py --format csv --ausgabe export/lehrgaenge.csv
+    python bin/export.py --quelle archiv --format ndjson --ausgabe archiv.ndjson.gz
+    python bin/export.py --von 01.01.2025 --bis 31.12.2025 --benachrichtigt ja
+"""
+
+import os
+import sys
+import time
+import logging
+import itertools
+import argparse
+from dotenv import load_dotenv
+
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.datenexport import (
+    TERMIN_FELDER, HISTORIE_FELDER, ARCHIV_FELDER, quelle_termine, quelle_historie, quelle_archiv,
+    filtere, oeffne_ausgabe, schreibe_export
+)
+from src.utils.profiling import erstelle_profiler, ergaenze_profiling_optionen
+from src.utils.termin_datum import parse_datum
+
+# Logging konfigurieren (stdout bleibt für die Ausgabe frei, StreamHandler schreibt nach stderr)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("logs/export.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("Export")
+
+# Konstanten
+JSON_FILE = "data/termine.json"
+LAST_SENT_FILE = "data/last_sent.json"
+HISTORIE_FILE = "data/historie.jsonl.gz"
+EMAIL_ARCHIVE_DIR = "data/email_archive"
+
+# Verfügbare Quellen: Name -> (Funktion, die den Datensatz-Generator erzeugt, CSV-Spalten)
+QUELLEN = {
+    "termine": (lambda: quelle_termine(JSON_FILE, LAST_SENT_FILE), TERMIN_FELDER),
+    "historie": (lambda: quelle_historie(HISTORIE_FILE), HISTORIE_FELDER),
+    # Aktive und in die Historie verschobene Lehrgänge zusammen
+    "alle": (
+        lambda: itertools.chain(quelle_termine(JSON_FILE, LAST_SENT_FILE), quelle_historie(HISTORIE_FILE)),
+        HISTORIE_FELDER
+    ),
+    "archiv": (lambda: quelle_archiv(os.getenv("EMAIL_ARCHIVE_DIR", EMAIL_ARCHIVE_DIR)), ARCHIV_FELDER),
+}
+
+def lese_argumente(argv=None):
+    """Liest die Kommandozeilenargumente"""
+    parser = argparse.ArgumentParser(description="Exportiert Lehrgänge als CSV oder NDJSON")
+    parser.add_argument("--quelle", choices=sorted(QUELLEN), default="alle",
+                        help="Datenquelle (Standard: alle)")
+    parser.add_argument("--format", dest="ausgabeformat", choices=["csv", "ndjson"], default="csv",
+                        help="Ausgabeformat (Standard: csv)")
+    parser.add_argument("--ausgabe", default="-",
+                        help="Ausgabedatei, '-' für stdout (Standard); Endung .gz komprimiert")
+    parser.add_argument("--gzip", action="store_true", help="Ausgabe gzip-komprimieren")
+    parser.add_argument("--von", type=parse_datum, help="Lehrgang endet frühestens an diesem Tag")
+    parser.add_argument("--bis", type=parse_datum, help="Lehrgang beginnt spätestens an diesem Tag")
+    parser.add_argument("--kursname", help="Teilstring im Kursnamen")
+    parser.add_argument("--status", help="Status des Lehrgangs, z.B. eingeladen")
+    parser.add_argument("--benachrichtigt", choices=["ja", "nein"],
+                        help="Nur (nicht) gemeldete Lehrgänge")
+    # Ausgewertet werden die Profiling-Optionen von erstelle_profiler
+    ergaenze_profiling_optionen(parser)
+    # Unbekannte Optionen führen zum Abbruch, statt z.B. ungefiltert zu exportieren
+    return parser.parse_args(argv)
+
+def main():
+    """Hauptfunktion"""
+    # Umgebungsvariablen laden
+    load_dotenv("config/.env")
+
+    argumente = lese_argumente()
+    profiler = erstelle_profiler("export")
+    quelle, felder = QUELLEN[argumente.quelle]
+    komprimiert = argumente.gzip or argumente.ausgabe.endswith(".gz")
+    benachrichtigt = None if argumente.benachrichtigt is None else argumente.benachrichtigt == "ja"
+
+    # termine.json und last_sent.json werden atomar ersetzt, an die Historie wird
+    # nur angehängt (ein unvollständiger letzter Block wird übersprungen); die
+    # Quellen bleiben daher während des gesamten Exports konsistent, eine Sperre
+    # ist nicht nötig.
+    datensaetze = filtere(
+        quelle(),
+        von=argumente.von,
+        bis=argumente.bis,
+        kursname=argumente.kursname,
+        status=argumente.status,
+        benachrichtigt=benachrichtigt
+    )
+
+    start = time.perf_counter()
+    try:
+        with profiler.stufe("export", speicher=True):
+            with oeffne_ausgabe(argumente.ausgabe, komprimiert) as ausgabe:
+                anzahl = schreibe_export(datensaetze, ausgabe, argumente.ausgabeformat, felder)
+    except (OSError, ValueError) as e:
+        logger.error(f"Export fehlgeschlagen: {e}")
+        return 1
+    finally:
+        profiler.abschliessen()
+
+    dauer = time.perf_counter() - start
+    rate = anzahl / dauer if dauer > 0 else 0
+    logger.info(
+        f"{anzahl} Datensätze aus '{argumente.quelle}' als {argumente.ausgabeformat}"
+        f"{' (gzip)' if komprimiert else ''} nach {argumente.ausgabe} exportiert "
+        f"in {dauer:.2f} s ({rate:.0f} Datensätze/s)"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# Made with Bob
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+iCalendar Feed
+
+Dieses Skript erzeugt aus der termine.json einen Kalender-Feed (.ics) mit allen
+gespeicherten Lehrgängen sowie optional je Abonnent einen eigenen Feed mit den
+für ihn passenden Lehrgängen.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+from dotenv import load_dotenv
+
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.dateisperre import datei_sperre, SperreBelegtError
+from src.utils.ical_feed import ICalFeed
+from src.utils.kurs_eintrag import lade_eintraege
+from src.utils.profiling import erstelle_profiler
+
+# Logging konfigurieren
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("logs/ical_feed.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("ICalFeed")
+
+# Konstanten
+JSON_FILE = "data/termine.json"
+ICS_DIR = "data/kalender"
+ICS_CACHE_FILE = "data/ics_cache.json"
+GESAMT_FEED = "lehrgaenge"
+
+def lade_json(datei):
+    """Lädt JSON oder gibt leere Liste zurück"""
+    if not os.path.exists(datei):
+        return []
+    try:
+        with open(datei, "r", encoding="utf-8") as f:
+            daten = json.load(f)
+        if not isinstance(daten, list):
+            return []
+        return daten
+    except json.JSONDecodeError:
+        return []
+
+def hole_abonnenten():
+    """Liest die Abonnenten-Feeds aus der Umgebungsvariablen ICS_ABONNENTEN
+
+    Format: name:Begriff1|Begriff2;name2:Begriff3
+
+    Returns:
+        dict: Name des Feeds -> Liste der Suchbegriffe
+    """
+    abonnenten = {}
+    for definition in os.getenv("ICS_ABONNENTEN", "").split(";"):
+        if ":" not in definition:
+            continue
+        name, begriffe = definition.split(":", 1)
+        # Name wird als Dateiname verwendet
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", name.strip())
+        suchbegriffe = [b.strip() for b in begriffe.split("|") if b.strip()]
+        if name == GESAMT_FEED:
+            # Würde sonst den Gesamt-Feed überschreiben
+            logger.warning(f"Abonnent '{name}' ignoriert: der Name ist für den Gesamt-Feed reserviert")
+            continue
+        if name and suchbegriffe:
+            abonnenten[name] = suchbegriffe
+    return abonnenten
+
+def passt(eintrag, suchbegriffe):
+    """Prüft, ob einer der Suchbegriffe in der Beschreibung vorkommt"""
+    beschreibung_lower = eintrag.beschreibung.lower()
+    return any(begriff.lower() in beschreibung_lower for begriff in suchbegriffe)
+
+def main():
+    """Hauptfunktion"""
+    # Umgebungsvariablen laden
+    load_dotenv("config/.env")
+
+    ics_dir = os.getenv("ICS_DIR", ICS_DIR)
+    profiler = erstelle_profiler("ical_feed")
+    try:
+        with profiler.stufe("laden"):
+            with datei_sperre(JSON_FILE, exklusiv=False):
+                eintraege = lade_eintraege(lade_json(JSON_FILE))
+        logger.info(f"{len(eintraege)} Einträge aus {JSON_FILE} geladen")
+
+        # Nur ein Lauf gleichzeitig darf Cache und Feeds aktualisieren
+        with datei_sperre(ICS_CACHE_FILE):
+            return erzeuge_feeds(eintraege, ics_dir, profiler)
+    except SperreBelegtError as e:
+        logger.warning(f"{e}, dieser Lauf wird übersprungen")
+        return 0
+    finally:
+        profiler.abschliessen()
+
+def erzeuge_feeds(eintraege, ics_dir, profiler):
+    """Erzeugt den Gesamt-Feed und die Abonnenten-Feeds"""
+    feed = ICalFeed(ICS_CACHE_FILE)
+    with profiler.stufe("rendern", speicher=True):
+        ereignisse = feed.ereignisse(eintraege)
+    logger.info(f"{feed.neu_erzeugt} Ereignisse neu erzeugt, {feed.wiederverwendet} aus dem Cache übernommen")
+
+    feeds = {GESAMT_FEED: [vevent for _, vevent in ereignisse]}
+    for name, suchbegriffe in hole_abonnenten().items():
+        feeds[name] = [vevent for eintrag, vevent in ereignisse if passt(eintrag, suchbegriffe)]
+
+    for name, vevents in feeds.items():
+        datei = os.path.join(ics_dir, f"{name}.ics")
+        with profiler.stufe("schreiben"):
+            etag, geschrieben = feed.schreibe(datei, feed.kalender(vevents, f"Lehrgänge ({name})"))
+        if geschrieben:
+            logger.info(f"{datei} mit {len(vevents)} Ereignissen geschrieben (ETag {etag})")
+        else:
+            logger.info(f"{datei} unverändert")
+
+    if not feed.speichere_cache():
+        logger.info(f"{ICS_CACHE_FILE} unverändert")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# Made with Bob
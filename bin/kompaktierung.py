@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Kompaktierung
+
+Dieses Skript verschiebt vergangene Lehrgänge aus termine.json in die
+komprimierte Historie (data/historie.jsonl.gz) und entfernt sie gleichzeitig
+aus last_sent.json. So bleibt der Bestand, den Monitor und Mail-Notifier bei
+jedem Lauf laden und abgleichen, auf aktive und kommende Lehrgänge begrenzt.
+
+Ein Lehrgang wird verschoben, wenn sein letzter Tag länger als
+AUFBEWAHRUNG_KARENZ_TAGE (Standard: 30) zurückliegt.
+
+Beispiele:
+    python bin/kompaktierung.py
+    python bin/kompaktierung.py --karenz-tage 90 --probelauf
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import datetime
+from dotenv import load_dotenv
+
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.aufbewahrung import (
+    stichtag, teile_nach_ablauf, historien_datensatz, haenge_an_historie, merke_stichtag
+)
+from src.utils.dateisperre import datei_sperre, schreibe_atomar, SperreBelegtError
+from src.utils.kurs_eintrag import lade_eintraege, serialisiere
+from src.utils.profiling import erstelle_profiler, ergaenze_profiling_optionen
+
+# Logging konfigurieren
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("logs/kompaktierung.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("Kompaktierung")
+
+# Konstanten
+JSON_FILE = "data/termine.json"
+LAST_SENT_FILE = "data/last_sent.json"
+HISTORIE_FILE = "data/historie.jsonl.gz"
+
+def lade_json(datei):
+    """Lädt JSON oder gibt leere Liste zurück
+
+    Anders als in den übrigen Skripten wird eine beschädigte Datei nicht als
+    leer behandelt, da sie sonst beim Zurückschreiben überschrieben würde.
+
+    Raises:
+        ValueError: Wenn die Datei keine gültige JSON-Liste enthält
+    """
+    if not os.path.exists(datei):
+        return []
+    with open(datei, "r", encoding="utf-8") as f:
+        daten = json.load(f)
+    if not isinstance(daten, list):
+        raise ValueError(f"{datei} enthält keine JSON-Liste")
+    return daten
+
+def karenz_tage(wert):
+    """Prüft die Karenzzeit: eine negative würde einen Stichtag in der Zukunft dauerhaft festschreiben"""
+    tage = int(wert)
+    if tage < 0:
+        raise argparse.ArgumentTypeError(f"darf nicht negativ sein: {wert}")
+    return tage
+
+def lese_argumente():
+    """Liest die Kommandozeilenargumente
+
+    Unbekannte Optionen führen zum Abbruch, damit z.B. ein vertippter
+    --probelauf nicht zu einer echten Kompaktierung führt.
+    """
+    parser = argparse.ArgumentParser(description="Verschiebt vergangene Lehrgänge in die Historie")
+    parser.add_argument("--karenz-tage", type=karenz_tage,
+                        help="Tage nach Lehrgangsende bis zur Verschiebung (Standard: AUFBEWAHRUNG_KARENZ_TAGE bzw. 30)")
+    parser.add_argument("--probelauf", action="store_true", help="Nur anzeigen, nichts ändern")
+    # Ausgewertet werden die Profiling-Optionen von erstelle_profiler
+    ergaenze_profiling_optionen(parser)
+    return parser.parse_args()
+
+def main():
+    """Hauptfunktion"""
+    # Umgebungsvariablen laden
+    load_dotenv("config/.env")
+
+    argumente = lese_argumente()
+    profiler = erstelle_profiler("kompaktierung")
+    try:
+        # Dieselbe Reihenfolge der Sperren wie im Mail-Notifier, damit sich die
+        # Skripte nicht gegenseitig blockieren. Beide Dateien werden gemeinsam
+        # bereinigt, sonst würden Lehrgänge erneut gemeldet.
+        with datei_sperre(LAST_SENT_FILE), datei_sperre(JSON_FILE), datei_sperre(HISTORIE_FILE):
+            return kompaktiere(stichtag(argumente.karenz_tage), argumente.probelauf, profiler)
+    except SperreBelegtError as e:
+        logger.warning(f"{e}, dieser Lauf wird übersprungen")
+        return 0
+    except (OSError, ValueError) as e:
+        logger.error(f"Kompaktierung fehlgeschlagen: {e}")
+        return 1
+    finally:
+        profiler.abschliessen()
+
+def kompaktiere(grenze, probelauf, profiler):
+    """Verschiebt alle vor dem Stichtag beendeten Lehrgänge in die Historie"""
+    with profiler.stufe("laden", speicher=True):
+        termine = lade_eintraege(lade_json(JSON_FILE))
+        gesendet = lade_eintraege(lade_json(LAST_SENT_FILE))
+
+    with profiler.stufe("aufteilen"):
+        aktive_termine, abgelaufene_termine = teile_nach_ablauf(termine, grenze)
+        aktive_gesendet, abgelaufene_gesendet = teile_nach_ablauf(gesendet, grenze)
+    logger.info(
+        f"Stichtag {grenze.strftime('%d.%m.%Y')}: {len(abgelaufene_termine)} von {len(termine)} Lehrgängen "
+        f"und {len(abgelaufene_gesendet)} von {len(gesendet)} gemeldeten Lehrgängen abgelaufen"
+    )
+    if not abgelaufene_termine and not abgelaufene_gesendet:
+        logger.info("Nichts zu verschieben")
+        return 0
+    if probelauf:
+        logger.info("Probelauf, es wurde nichts geändert")
+        return 0
+
+    with profiler.stufe("speichern"):
+        # Erst die Historie schreiben: bricht der Lauf danach ab, werden die
+        # Lehrgänge beim nächsten Mal höchstens doppelt archiviert, nie verloren
+        gesendet_keys = {eintrag.schluessel for eintrag in gesendet}
+        archiviert_am = datetime.date.today().isoformat()
+        haenge_an_historie(HISTORIE_FILE, [
+            historien_datensatz(eintrag, eintrag.schluessel in gesendet_keys, archiviert_am)
+            for eintrag in abgelaufene_termine
+        ])
+        # Noch unter der Sperre von termine.json, damit der Monitor ab jetzt
+        # keinen der verschobenen Lehrgänge erneut aufnimmt
+        merke_stichtag(HISTORIE_FILE, grenze)
+        schreibe_atomar(JSON_FILE, serialisiere(aktive_termine))
+        schreibe_atomar(LAST_SENT_FILE, serialisiere(aktive_gesendet))
+
+    logger.info(
+        f"{len(abgelaufene_termine)} Lehrgänge nach {HISTORIE_FILE} verschoben, "
+        f"{len(aktive_termine)} aktive Lehrgänge verbleiben"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# Made with Bob
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lasttest
+
+Dieses Skript führt den kompletten Ablauf von run_monitor_and_notify.py mehrfach
+gegen lokale Platzhalter aus: einen HTTP-Server, der generierte KFV-Seiten mit
+einstellbarer Latenz und Fehlerquote liefert, und einen SMTP-Server (mit
+STARTTLS und AUTH), der die Nachrichten mit einstellbarer Verzögerung annimmt
+und nur zählt. Der Lauf findet in einem eigenen Arbeitsverzeichnis statt, die
+echten Daten in data/ bleiben unberührt.
+
+Am Ende werden Latenz-Perzentile, Durchsatz, maximaler Speicherbedarf (RSS)
+der Kindprozesse und die Anzahl der zugestellten Nachrichten ausgegeben.
+
+Beispiele:
+    python bin/lasttest.py
+    python bin/lasttest.py --iterationen 20 --zeilen 20000 --empfaenger 300
+    python bin/lasttest.py --latenz 2 --fehlerquote 0.2 --smtp-verzoegerung 5
+"""
+
+import os
+import ssl
+import sys
+import html
+import time
+import base64
+import random
+import shutil
+import logging
+import argparse
+import datetime
+import resource
+import tempfile
+import threading
+import subprocess
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.kurs_eintrag import lade_eintraege
+from src.utils.datenexport import iter_json_array
+
+# Logging konfigurieren
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("logs/lasttest.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("Lasttest")
+
+# Konstanten
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_monitor_and_notify.py")
+KURSE = ["Atemschutzgeräteträger", "Truppmann Teil 1", "Maschinist", "TM2", "Sprechfunker", "Truppführer"]
+STATUS = ["eingeladen", "geplant", "ausgebucht"]
+SUCHBEGRIFFE = "Atemschutz,Truppmann,TM2"
+PERZENTILE = (50, 90, 95, 99)
+
+def erzeuge_seite(zeilen, neue_zeilen, iteration):
+    """Erzeugt eine Seite im Aufbau der KFV-Terminliste.
+
+    Die ersten Zeilen sind in jeder Iteration gleich; zusätzlich enthält jede
+    Iteration neue_zeilen eigene Lehrgänge, damit jeder Lauf neue Einträge
+    findet und Benachrichtigungen versendet.
+
+    Returns:
+        bytes: Die HTML-Seite (UTF-8)
+    """
+    heute = datetime.date.today()
+    teile = [
+        "<html><head><meta charset=\"utf-8\"><title>Termine Kreisausbildung</title></head><body>",
+        "<table class=\"termine\">",
+        "<tr><th>Termin</th><th>Lehrgang</th><th>Ort</th></tr>",
+    ]
+
+    def zeile(titel, status, beginn, tage, nummer):
+        termine = "<br>".join(
+            (beginn + datetime.timedelta(days=tag)).strftime("%d.%m.%Y") for tag in range(tage)
+        )
+        return (
+            f"<tr>\n<td>{termine}</td>\n"
+            f"<td><h3>{html.escape(titel)}</h3>Lehrgang Nr. {nummer}<br>{status}</td>\n"
+            f"<td>Feuerwehrhaus {nummer % 40}. Hauptstraße {nummer % 97}. 72622 Nürtingen</td>\n</tr>"
+        )
+
+    for nummer in range(zeilen):
+        titel = f"{KURSE[nummer % len(KURSE)]} {nummer // len(KURSE)}"
+        beginn = heute + datetime.timedelta(days=30 + nummer % 365)
+        teile.append(zeile(titel, STATUS[nummer % len(STATUS)], beginn, 1 + nummer % 3, nummer))
+    for nummer in range(neue_zeilen):
+        titel = f"{KURSE[nummer % 2]} Zusatztermin {iteration}-{nummer}"
+        beginn = heute + datetime.timedelta(days=60 + nummer)
+        teile.append(zeile(titel, "geplant", beginn, 2, zeilen + nummer))
+
+    teile.append("</table></body></html>")
+    return "\n".join(teile).encode("utf-8")
+
+class SeitenHandler(BaseHTTPRequestHandler):
+    """Liefert die aktuelle Seite mit Latenz und zufälligen Fehlern"""
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latenz)
+        with server.lock:
+            server.anfragen += 1
+            fehler = server.zufall.random() < server.fehlerquote
+            if fehler:
+                server.fehler += 1
+        if fehler:
+            self.send_error(503, "Service Unavailable")
+            return
+        seite = server.seite
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(seite)))
+        self.end_headers()
+        self.wfile.write(seite)
+
+    def log_message(self, format, *args):
+        pass
+
+class SeitenServer(ThreadingHTTPServer):
+    """HTTP-Platzhalter für die KFV-Webseite"""
+
+    daemon_threads = True
+
+    def __init__(self, latenz, fehlerquote, seed):
+        super().__init__(("127.0.0.1", 0), SeitenHandler)
+        self.latenz = latenz
+        self.fehlerquote = fehlerquote
+        self.zufall = random.Random(seed)
+        self.lock = threading.Lock()
+        self.seite = b""
+        self.anfragen = 0
+        self.fehler = 0
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """Minimaler SMTP-Dialog mit STARTTLS und AUTH (jede Anmeldung wird akzeptiert)"""
+
+    def antworte(self, *zeilen):
+        ausgabe = "".join(
+            f"{zeile[:3]}{'-' if i < len(zeilen) - 1 else ' '}{zeile[4:]}\r\n" for i, zeile in enumerate(zeilen)
+        )
+        self.wfile.write(ausgabe.encode("ascii"))
+
+    def lese_zeile(self):
+        return self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+
+    def handle(self):
+        server = self.server
+        tls = False
+        empfaenger = 0
+        self.antworte("220 lasttest ESMTP")
+        while True:
+            zeile = self.rfile.readline()
+            if not zeile:
+                return
+            befehl = zeile.decode("utf-8", "replace").strip()
+            verb = befehl.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                erweiterungen = ["250 lasttest"]
+                if not tls:
+                    erweiterungen.append("250 STARTTLS")
+                erweiterungen += ["250 AUTH PLAIN LOGIN", "250 8BITMIME"]
+                self.antworte(*erweiterungen)
+            elif verb == "HELO":
+                self.antworte("250 lasttest")
+            elif verb == "STARTTLS" and not tls:
+                self.antworte("220 Ready to start TLS")
+                self.request = server.ssl_kontext.wrap_socket(self.request, server_side=True)
+                self.rfile = self.request.makefile("rb")
+                self.wfile = self.request.makefile("wb", buffering=0)
+                tls = True
+            elif verb == "AUTH":
+                teile = befehl.split()
+                if len(teile) >= 2 and teile[1].upper() == "LOGIN":
+                    if len(teile) < 3:
+                        self.antworte("334 " + base64.b64encode(b"Username:").decode())
+                        self.lese_zeile()
+                    self.antworte("334 " + base64.b64encode(b"Password:").decode())
+                    self.lese_zeile()
+                elif len(teile) == 2:
+                    self.antworte("334 ")
+                    self.lese_zeile()
+                self.antworte("235 Authentication successful")
+            elif verb == "MAIL":
+                empfaenger = 0
+                self.antworte("250 OK")
+            elif verb == "RCPT":
+                empfaenger += 1
+                self.antworte("250 OK")
+            elif verb == "DATA":
+                self.antworte("354 End data with <CR><LF>.<CR><LF>")
+                groesse = 0
+                while True:
+                    daten = self.rfile.readline()
+                    if not daten or daten == b".\r\n":
+                        break
+                    groesse += len(daten)
+                time.sleep(server.verzoegerung)
+                with server.lock:
+                    server.nachrichten += 1
+                    server.empfaenger += empfaenger
+                    server.bytes += groesse
+                self.antworte("250 Message accepted")
+            elif verb in ("RSET", "NOOP"):
+                self.antworte("250 OK")
+            elif verb == "QUIT":
+                self.antworte("221 Bye")
+                return
+            else:
+                self.antworte("502 Command not implemented")
+
+class SmtpSenke(socketserver.ThreadingTCPServer):
+    """SMTP-Platzhalter, der Nachrichten annimmt und zählt"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, verzoegerung, zertifikat, schluessel):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.verzoegerung = verzoegerung
+        self.ssl_kontext = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_kontext.load_cert_chain(zertifikat, schluessel)
+        self.lock = threading.Lock()
+        self.nachrichten = 0
+        self.empfaenger = 0
+        self.bytes = 0
+
+def erzeuge_zertifikat(verzeichnis):
+    """Erzeugt ein selbstsigniertes Zertifikat für STARTTLS
+
+    Returns:
+        tuple: (Pfad zum Zertifikat, Pfad zum Schlüssel)
+    """
+    schluessel = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    jetzt = datetime.datetime.now(datetime.timezone.utc)
+    zertifikat = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(schluessel.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(jetzt - datetime.timedelta(minutes=5))
+        .not_valid_after(jetzt + datetime.timedelta(days=1))
+        .sign(schluessel, hashes.SHA256())
+    )
+    zertifikat_datei = os.path.join(verzeichnis, "smtp_cert.pem")
+    schluessel_datei = os.path.join(verzeichnis, "smtp_key.pem")
+    with open(zertifikat_datei, "wb") as f:
+        f.write(zertifikat.public_bytes(serialization.Encoding.PEM))
+    with open(schluessel_datei, "wb") as f:
+        f.write(schluessel.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        ))
+    return zertifikat_datei, schluessel_datei
+
+def perzentil(werte, p):
+    """Perzentil nach dem Nearest-Rank-Verfahren"""
+    if not werte:
+        return 0.0
+    sortiert = sorted(werte)
+    rang = max(1, -(-p * len(sortiert) // 100))
+    return sortiert[int(rang) - 1]
+
+def zaehle_eintraege(datei):
+    """Anzahl der gespeicherten Einträge einer JSON-Liste"""
+    if not os.path.exists(datei):
+        return 0
+    return len(lade_eintraege(iter_json_array(datei)))
+
+def lese_argumente():
+    """Liest die Kommandozeilenargumente"""
+    parser = argparse.ArgumentParser(description="Lasttest für run_monitor_and_notify.py")
+    parser.add_argument("--iterationen", type=int, default=5, help="Anzahl der Läufe (Standard: 5)")
+    parser.add_argument("--zeilen", type=int, default=20000, help="Tabellenzeilen der Seite (Standard: 20000)")
+    parser.add_argument("--neue-zeilen", type=int, default=5, help="Neue Lehrgänge je Lauf (Standard: 5)")
+    parser.add_argument("--empfaenger", type=int, default=300, help="Anzahl der Empfänger (Standard: 300)")
+    parser.add_argument("--latenz", type=float, default=0.0, help="Antwortverzögerung des HTTP-Servers in Sekunden")
+    parser.add_argument("--fehlerquote", type=float, default=0.0,
+                        help="Anteil der HTTP-Anfragen, die mit 503 beantwortet werden (0 bis 1)")
+    parser.add_argument("--smtp-verzoegerung", type=float, default=0.0,
+                        help="Verzögerung des SMTP-Servers je Nachricht in Sekunden")
+    parser.add_argument("--seed", type=int, default=1, help="Startwert für die zufälligen Fehler")
+    parser.add_argument("--verzeichnis", help="Arbeitsverzeichnis (Standard: temporäres Verzeichnis)")
+    parser.add_argument("--behalten", action="store_true", help="Temporäres Arbeitsverzeichnis nicht löschen")
+    return parser.parse_args()
+
+def main():
+    """Hauptfunktion"""
+    argumente = lese_argumente()
+    verzeichnis = argumente.verzeichnis or tempfile.mkdtemp(prefix="lasttest_")
+    for unterverzeichnis in ("data", "logs", "config"):
+        os.makedirs(os.path.join(verzeichnis, unterverzeichnis), exist_ok=True)
+    logger.info(f"Arbeitsverzeichnis: {verzeichnis}")
+
+    seiten_server = SeitenServer(argumente.latenz, argumente.fehlerquote, argumente.seed)
+    smtp_senke = SmtpSenke(argumente.smtp_verzoegerung, *erzeuge_zertifikat(verzeichnis))
+    for server in (seiten_server, smtp_senke):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Die Skripte laden config/.env des Arbeitsverzeichnisses (nicht vorhanden),
+    # die Konfiguration kommt daher vollständig aus der Umgebung
+    umgebung = dict(os.environ)
+    umgebung.update({
+        "MONITOR_URL": f"http://127.0.0.1:{seiten_server.server_address[1]}/index.asp",
+        "SEARCH_TEXT": SUCHBEGRIFFE,
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_senke.server_address[1]),
+        "SMTP_USERNAME": "lasttest",
+        "SMTP_PASSWORD": "lasttest",
+        "SENDER_EMAIL": "lasttest@example.de",
+        "RECIPIENT_EMAIL": ",".join(f"empfaenger{i}@example.de" for i in range(argumente.empfaenger)),
+    })
+
+    dauern = []
+    fehlgeschlagen = 0
+    try:
+        for iteration in range(argumente.iterationen):
+            seiten_server.seite = erzeuge_seite(argumente.zeilen, argumente.neue_zeilen, iteration)
+            start = time.perf_counter()
+            ergebnis = subprocess.run(
+                [sys.executable, RUNNER],
+                cwd=verzeichnis,
+                env=umgebung,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            dauer = time.perf_counter() - start
+            dauern.append(dauer)
+            if ergebnis.returncode != 0:
+                fehlgeschlagen += 1
+            logger.info(f"Lauf {iteration + 1}/{argumente.iterationen}: {dauer:.2f} s (Exit-Code {ergebnis.returncode})")
+    finally:
+        seiten_server.shutdown()
+        smtp_senke.shutdown()
+
+    gesamt = sum(dauern)
+    # ru_maxrss ist unter Linux in KiB angegeben und umfasst alle beendeten Kindprozesse
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    gespeichert = zaehle_eintraege(os.path.join(verzeichnis, "data", "termine.json"))
+    gemeldet = zaehle_eintraege(os.path.join(verzeichnis, "data", "last_sent.json"))
+
+    bericht = [
+        "=== Ergebnis des Lasttests ===",
+        f"Läufe: {len(dauern)} ({fehlgeschlagen} mit Fehler), Gesamtdauer {gesamt:.2f} s",
+        "Latenz je Lauf: " + ", ".join(f"p{p} {perzentil(dauern, p):.2f} s" for p in PERZENTILE)
+        + f", max {max(dauern, default=0):.2f} s",
+        f"Durchsatz: {len(dauern) / gesamt * 60 if gesamt else 0:.1f} Läufe/min, "
+        f"{argumente.zeilen * len(dauern) / gesamt if gesamt else 0:.0f} Tabellenzeilen/s",
+        f"Maximaler RSS der Kindprozesse: {max_rss:.1f} MiB",
+        f"HTTP: {seiten_server.anfragen} Anfragen, davon {seiten_server.fehler} mit Fehler 503",
+        f"SMTP: {smtp_senke.nachrichten} Nachrichten an {smtp_senke.empfaenger} Empfänger zugestellt "
+        f"({smtp_senke.bytes / 1024:.0f} KiB)",
+        f"Gespeicherte Lehrgänge: {gespeichert}, davon gemeldet: {gemeldet}",
+    ]
+    logger.info("\n".join(bericht))
+
+    if not argumente.verzeichnis and not argumente.behalten:
+        shutil.rmtree(verzeichnis, ignore_errors=True)
+    return 1 if fehlgeschlagen else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# Made with Bob
@@ -23,7 +23,10 @@ import os
 
 # Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.utils.credential_manager import CredentialManager
+from src.utils.credential_provider import get_credential_provider
+from src.utils.dateisperre import datei_sperre, schreibe_atomar, SperreBelegtError
+from src.utils.kurs_eintrag import lade_eintraege, serialisiere
+from src.utils.profiling import erstelle_profiler
 
 # Logging konfigurieren
 logging.basicConfig(
@@ -42,50 +45,31 @@ LAST_SENT_FILE = "data/last_sent.json"
 EMAIL_ARCHIVE_DIR = "data/email_archive"
 
 def lade_json(datei):
-    """Lädt JSON oder gibt leere Liste zurück"""
+    """Lädt JSON oder gibt leere Liste zurück
+
+    Eine beschädigte Datei wird nicht als leer behandelt, da sie sonst beim
+    Zurückschreiben überschrieben würde und bei last_sent.json alle Lehrgänge erneut gemeldet würden.
+
+    Raises:
+        ValueError: Wenn die Datei keine gültige JSON-Liste enthält
+    """
     if not os.path.exists(datei):
         return []
-    try:
-        with open(datei, "r", encoding="utf-8") as f:
-            daten = json.load(f)
-        if not isinstance(daten, list):
-            return []
-        return daten
-    except json.JSONDecodeError:
-        return []
+    with open(datei, "r", encoding="utf-8") as f:
+        daten = json.load(f)
+    if not isinstance(daten, list):
+        raise ValueError(f"{datei} enthält keine JSON-Liste")
+    return daten
 
 def speichere_json(datei, daten):
-    """Speichert Daten als JSON"""
-    with open(datei, "w", encoding="utf-8") as f:
-        json.dump(daten, f, ensure_ascii=False, indent=4)
-
-def erstelle_key(eintrag):
-    """Erstellt einen eindeutigen Schlüssel für einen Eintrag"""
-    termin = eintrag['termin']
-    beschreibung = eintrag['beschreibung']
-    
-    # Extrahiere den Kursnamen aus der Beschreibung
-    kursname = beschreibung
-    if " - " in beschreibung:
-        kursname = beschreibung.split(" - ")[0]
-    
-    # Wir verwenden den Termin und den Kursnamen (ohne Status) für den Key
-    # So werden auch mehrere Lehrgänge desselben Typs mit unterschiedlichen Terminen erkannt,
-    # unabhängig vom Status (geplant, eingeladen, etc.)
-    return f"{termin}|{kursname}"
+    """Speichert Einträge kompakt als JSON (atomar, Leser sehen nie eine halb geschriebene Datei)"""
+    schreibe_atomar(datei, serialisiere(daten))
 
 def formatiere_eintrag_html(eintrag):
     """Formatiert einen Eintrag als HTML für die E-Mail"""
-    # Extrahiere Status aus der Beschreibung (z.B. "Atemschutzgeräteträger - eingeladen")
-    beschreibung = eintrag["beschreibung"]
-    status = "unbekannt"
-    
-    if " - " in beschreibung:
-        teile = beschreibung.split(" - ")
-        kurs = teile[0]
-        status = teile[1]
-    else:
-        kurs = beschreibung
+    # Kursname und Status stammen aus der Beschreibung (z.B. "Atemschutzgeräteträger - eingeladen")
+    kurs = eintrag.kursname
+    status = eintrag.status or "unbekannt"
     
     # Formatiere den Ort schöner (mit Zeilenumbrüchen)
     ort = eintrag["ort"].replace(". ", ".<br>")
@@ -114,16 +98,9 @@ def formatiere_eintrag_html(eintrag):
 
 def formatiere_eintrag_text(eintrag):
     """Formatiert einen Eintrag als Text für die E-Mail"""
-    # Extrahiere Status aus der Beschreibung
-    beschreibung = eintrag["beschreibung"]
-    status = "unbekannt"
-    
-    if " - " in beschreibung:
-        teile = beschreibung.split(" - ")
-        kurs = teile[0]
-        status = teile[1]
-    else:
-        kurs = beschreibung
+    # Kursname und Status stammen aus der Beschreibung
+    kurs = eintrag.kursname
+    status = eintrag.status or "unbekannt"
     
     text = f"""
 {kurs}
@@ -201,25 +178,13 @@ def sende_email(neue_eintraege):
             logger.error("Keine Empfänger-E-Mail-Adressen konfiguriert")
             return False
         
-        # Credentials laden
-        cred_manager = CredentialManager()
-        
-        # Versuche zuerst, SMTP-Credentials aus Umgebungsvariablen zu laden
-        smtp_username = os.getenv("SMTP_USERNAME")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        
-        # Wenn keine Umgebungsvariablen vorhanden sind, verwende verschlüsselte Credentials
-        if not smtp_username or not smtp_password:
-            try:
-                smtp_username, smtp_password = cred_manager.load_credentials("config/smtp_credentials.enc")
-                logger.info("SMTP-Anmeldedaten aus verschlüsselter Datei geladen")
-            except Exception as e:
-                logger.error(f"Fehler beim Laden der SMTP-Credentials: {e}")
-                # Wenn keine SMTP-Credentials gefunden wurden, aber E-Mail-Archivierung aktiviert ist,
-                # speichern wir die E-Mail trotzdem als Datei
-                return False
-        else:
-            logger.info("SMTP-Anmeldedaten aus Umgebungsvariablen geladen")
+        # Credentials laden (zuerst Umgebungsvariablen, sonst verschlüsselte Datei;
+        # einmal entschlüsselt und im Speicher gehalten)
+        try:
+            smtp_username, smtp_password = get_credential_provider().get_credentials()
+        except Exception as e:
+            logger.error(f"Fehler beim Laden der SMTP-Credentials: {e}")
+            return False
         
         # Betreff erstellen
         betreff = f"Neue Lehrgänge gefunden ({len(neue_eintraege)})"
@@ -288,45 +253,68 @@ def main():
     # Umgebungsvariablen laden
     load_dotenv("config/.env")
     
-    # Aktuelle Einträge laden
-    aktuelle_eintraege = lade_json(JSON_FILE)
-    logger.info(f"{len(aktuelle_eintraege)} Einträge aus {JSON_FILE} geladen")
-    
-    # Zuletzt gesendete Einträge laden
-    letzte_eintraege = lade_json(LAST_SENT_FILE)
-    logger.info(f"{len(letzte_eintraege)} Einträge aus {LAST_SENT_FILE} geladen")
-    
-    # Schlüssel der letzten Einträge erstellen
-    letzte_keys = {erstelle_key(eintrag) for eintrag in letzte_eintraege}
+    # Profiling nur bei --profile bzw. PROFILE=True, sonst ohne Mehraufwand
+    profiler = erstelle_profiler("mail_notifier")
+    try:
+        # Die Sperre auf last_sent.json wird bis nach dem Versand gehalten, damit
+        # überlappende Läufe dieselben Einträge nicht doppelt melden
+        with datei_sperre(LAST_SENT_FILE):
+            benachrichtige(profiler)
+    except SperreBelegtError as e:
+        logger.warning(f"{e}, dieser Lauf wird übersprungen")
+    except (OSError, ValueError) as e:
+        logger.error(f"Benachrichtigung abgebrochen, nichts gesendet oder gespeichert: {e}")
+        return 1
+    finally:
+        profiler.abschliessen()
+    return 0
+
+def benachrichtige(profiler):
+    """Ermittelt neue Einträge und versendet die Benachrichtigung"""
+    with profiler.stufe("laden", speicher=True):
+        # Aktuelle Einträge laden
+        with datei_sperre(JSON_FILE, exklusiv=False):
+            aktuelle_eintraege = lade_eintraege(lade_json(JSON_FILE))
+        logger.info(f"{len(aktuelle_eintraege)} Einträge aus {JSON_FILE} geladen")
+        
+        # Zuletzt gesendete Einträge laden
+        letzte_eintraege = lade_eintraege(lade_json(LAST_SENT_FILE))
+        logger.info(f"{len(letzte_eintraege)} Einträge aus {LAST_SENT_FILE} geladen")
     
-    # Neue Einträge finden
-    neue_eintraege = []
-    for eintrag in aktuelle_eintraege:
-        key = erstelle_key(eintrag)
-        if key not in letzte_keys:
-            neue_eintraege.append(eintrag)
+    with profiler.stufe("abgleich"):
+        # Schlüssel der letzten Einträge erstellen
+        letzte_keys = {eintrag.schluessel for eintrag in letzte_eintraege}
+        
+        # Neue Einträge finden
+        neue_eintraege = []
+        for eintrag in aktuelle_eintraege:
+            key = eintrag.schluessel
+            if key not in letzte_keys:
+                neue_eintraege.append(eintrag)
     
     logger.info(f"{len(neue_eintraege)} neue Einträge gefunden")
     
-    # Betreff und Inhalt für E-Mail erstellen
-    if neue_eintraege:
-        betreff = f"Neue Lehrgänge gefunden ({len(neue_eintraege)})"
-        text_content = f"Neue Lehrgänge gefunden: {len(neue_eintraege)}\n\n"
-        for eintrag in neue_eintraege:
-            text_content += formatiere_eintrag_text(eintrag)
-    else:
-        betreff = "Keine neuen Lehrgänge gefunden"
-        text_content = "Es wurden keine neuen Lehrgänge gefunden.\n"
-    
-    # E-Mail als Datei speichern (auch wenn keine E-Mail gesendet wird)
-    speichere_email_als_datei(betreff, text_content, None)
+    with profiler.stufe("rendern", speicher=True):
+        # Betreff und Inhalt für E-Mail erstellen
+        if neue_eintraege:
+            betreff = f"Neue Lehrgänge gefunden ({len(neue_eintraege)})"
+            text_content = f"Neue Lehrgänge gefunden: {len(neue_eintraege)}\n\n"
+            for eintrag in neue_eintraege:
+                text_content += formatiere_eintrag_text(eintrag)
+        else:
+            betreff = "Keine neuen Lehrgänge gefunden"
+            text_content = "Es wurden keine neuen Lehrgänge gefunden.\n"
+        
+        # E-Mail als Datei speichern (auch wenn keine E-Mail gesendet wird)
+        speichere_email_als_datei(betreff, text_content, None)
     
     
     # E-Mail nur senden, wenn neue Einträge gefunden wurden
     email_sent = False
     if neue_eintraege:
         try:
-            email_sent = sende_email(neue_eintraege)
+            with profiler.stufe("versand", speicher=True):
+                email_sent = sende_email(neue_eintraege)
         except Exception as e:
             logger.error(f"Fehler beim Senden der E-Mail: {e}")
     else:
@@ -334,10 +322,11 @@ def main():
     
     # Die aktuellen Einträge als "gesendet" speichern, auch wenn der E-Mail-Versand fehlschlägt
     if neue_eintraege:
-        speichere_json(LAST_SENT_FILE, aktuelle_eintraege)
+        with profiler.stufe("speichern"):
+            speichere_json(LAST_SENT_FILE, aktuelle_eintraege)
         logger.info(f"Aktuelle Einträge in {LAST_SENT_FILE} gespeichert")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
 # Made with Bob
@@ -13,9 +13,19 @@ from bs4 import BeautifulSoup
 import json
 import os
 import re
+import hashlib
 import logging
 from dotenv import load_dotenv
 import urllib3
+import sys
+
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.aufbewahrung import wirksamer_stichtag, ist_abgelaufen
+from src.utils.dateisperre import datei_sperre, schreibe_atomar, SperreBelegtError
+from src.utils.kurs_eintrag import KursEintrag, lade_eintraege, serialisiere
+from src.utils.profiling import erstelle_profiler
+from src.utils.zeilen_cache import ZeilenCache
 
 # SSL-Warnungen unterdrücken
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -34,46 +44,52 @@ logger = logging.getLogger("Monitor")
 # Konstanten
 URL = "https://www.kfv-esnt.de/index.asp?ID=1894&CAT=Ausbildung&SUBCAT=Termine%20Kreisausbildung&SPRACHE=1"
 JSON_FILE = "data/termine.json"
+ZEILEN_CACHE_FILE = "data/zeilen_cache.json"
+HISTORIE_FILE = "data/historie.jsonl.gz"
+REQUEST_TIMEOUT = 30
+TABELLE_START = re.compile(r"<table\b[^>]*>", re.IGNORECASE)
+TABELLE_ENDE = re.compile(r"</table\s*>", re.IGNORECASE)
+ZEILE_START = re.compile(r"<tr\b", re.IGNORECASE)
+ZEILE = re.compile(r"<tr\b.*?</tr\s*>", re.IGNORECASE | re.DOTALL)
+
+def zeilen_cache_datei(url):
+    """Cache-Datei für die Tabellenzeilen einer Seite
+
+    Jede Seite erhält eine eigene Datei, damit Monitore für verschiedene Seiten
+    sich nicht gegenseitig die Zeilen aus dem Cache entfernen. Für die
+    Standardseite bleibt der bisherige Dateiname erhalten.
+    """
+    if url == URL:
+        return ZEILEN_CACHE_FILE
+    kennung = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    basis, endung = os.path.splitext(ZEILEN_CACHE_FILE)
+    return f"{basis}_{kennung}{endung}"
 
 def bereinige_text(text):
     """Tabs, mehrfach Leerzeichen und Zeilenumbrüche entfernen"""
     text = re.sub(r'\s+', ' ', text)  # Alle Whitespaces zu einem
     return text.strip()
 
-def erstelle_key(termin, beschreibung):
-    """Eindeutigen Key erzeugen, um Duplikate zu vermeiden"""
-    # Bei Zeiträumen (Format: "10.10.2025 - 25.10.2025") den Zeitraum und den Kursnamen verwenden
-    termin_clean = bereinige_text(termin).lower()
-    
-    # Extrahiere den Kursnamen aus der Beschreibung
-    kursname = beschreibung
-    if " - " in beschreibung:
-        kursname = beschreibung.split(" - ")[0]
-    
-    kursname_clean = bereinige_text(kursname).lower()
-    
-    # Wir verwenden den Termin und den Kursnamen (ohne Status) für den Key
-    # So werden auch mehrere Lehrgänge desselben Typs mit unterschiedlichen Terminen erkannt,
-    # unabhängig vom Status (geplant, eingeladen, etc.)
-    return f"{termin_clean}|{kursname_clean}"
-
 def lade_json(datei):
-    """Lädt JSON oder gibt leere Liste zurück"""
+    """Lädt JSON oder gibt leere Liste zurück
+
+    Eine beschädigte Datei wird nicht als leer behandelt, da sie sonst beim
+    Zurückschreiben überschrieben würde.
+
+    Raises:
+        ValueError: Wenn die Datei keine gültige JSON-Liste enthält
+    """
     if not os.path.exists(datei):
         return []
-    try:
-        with open(datei, "r", encoding="utf-8") as f:
-            daten = json.load(f)
-        if not isinstance(daten, list):
-            return []
-        return daten
-    except json.JSONDecodeError:
-        return []
+    with open(datei, "r", encoding="utf-8") as f:
+        daten = json.load(f)
+    if not isinstance(daten, list):
+        raise ValueError(f"{datei} enthält keine JSON-Liste")
+    return daten
 
 def speichere_json(datei, daten):
-    """Speichert Daten als JSON"""
-    with open(datei, "w", encoding="utf-8") as f:
-        json.dump(daten, f, ensure_ascii=False, indent=4)
+    """Speichert Einträge kompakt als JSON (atomar, Leser sehen nie eine halb geschriebene Datei)"""
+    schreibe_atomar(datei, serialisiere(daten))
 
 def hole_suchbegriffe():
     """Holt die Suchbegriffe aus der Umgebungsvariablen"""
@@ -87,6 +103,50 @@ def hole_suchbegriffe():
     logger.info(f"Suchbegriffe: {suchbegriffe}")
     return suchbegriffe
 
+def extrahiere_zeile(row):
+    """Extrahiert die Einträge einer Tabellenzeile (ohne Filterung nach Suchbegriffen)"""
+    cols = row.find_all("td")
+    if len(cols) != 3:
+        return []
+    
+    # Termine extrahieren
+    termin_text = cols[0].get_text(separator="\n")
+    termine = [t.strip() for t in termin_text.split("\n") if t.strip()]
+    if not termine:
+        return []
+        
+    # Beschreibung extrahieren
+    beschreibung_element = cols[1]
+    titel_tag = beschreibung_element.find("h3")
+    titel = titel_tag.get_text(strip=True) if titel_tag else ""
+    
+    beschreibung_text = beschreibung_element.get_text(separator="\n")
+    text_lines = [line.strip() for line in beschreibung_text.split("\n") if line.strip()]
+    status = text_lines[-1] if text_lines else ""
+    
+    beschreibung = f"{titel} - {status}" if titel else status
+    
+    # Ort extrahieren
+    ort_text = cols[2].get_text(separator="\n")
+    ort = bereinige_text(ort_text)
+    
+    # Wenn mehrere Termine vorhanden sind, handelt es sich um einen Zeitraum
+    if len(termine) >= 2:
+        # Sortiere die Termine (falls sie nicht in chronologischer Reihenfolge sind)
+        termine.sort()
+        # Erstelle einen Zeitraum vom ersten bis zum letzten Termin
+        termine = [f"{termine[0]} - {termine[-1]}"]
+    
+    # Kursname und Status werden im KursEintrag aus der Beschreibung abgeleitet
+    return [KursEintrag(termin, beschreibung, ort) for termin in termine]
+
+def passt_zu_suchbegriffen(eintraege, suchbegriffe):
+    """Prüft, ob einer der Suchbegriffe im Titel oder in der Beschreibung vorkommt"""
+    if not eintraege:
+        return False
+    beschreibung_lower = eintraege[0].beschreibung.lower()
+    return any(begriff.lower() in beschreibung_lower for begriff in suchbegriffe)
+
 def extrahiere_termine_aus_tabelle(soup, suchbegriffe):
     """Extrahiert Termine aus der HTML-Tabelle"""
     gefundene_termine = []
@@ -105,67 +165,76 @@ def extrahiere_termine_aus_tabelle(soup, suchbegriffe):
     
     # Erste Zeile überspringen (Überschriften)
     for row in rows[0:]:
-        cols = row.find_all("td")
-        if len(cols) != 3:
-            continue
-        
-        # Termine extrahieren
-        termin_text = cols[0].get_text(separator="\n")
-        termine = [t.strip() for t in termin_text.split("\n") if t.strip()]
-        if not termine:
-            continue
-            
-        # Beschreibung extrahieren
-        beschreibung_element = cols[1]
-        titel_tag = beschreibung_element.find("h3")
-        titel = titel_tag.get_text(strip=True) if titel_tag else ""
-        
-        beschreibung_text = beschreibung_element.get_text(separator="\n")
-        text_lines = [line.strip() for line in beschreibung_text.split("\n") if line.strip()]
-        status = text_lines[-1] if text_lines else ""
-        
-        beschreibung = f"{titel} - {status}" if titel else status
-        
-        # Ort extrahieren
-        ort_text = cols[2].get_text(separator="\n")
-        ort = bereinige_text(ort_text)
-        
-        # Prüfen, ob einer der Suchbegriffe im Titel oder in der Beschreibung vorkommt
-        beschreibung_lower = beschreibung.lower()
-        if not any(begriff.lower() in beschreibung_lower for begriff in suchbegriffe):
-            continue
-            
-        # Extrahiere den Kursnamen und Status aus der Beschreibung
-        kursname = beschreibung
-        status = ""
-        if " - " in beschreibung:
-            teile = beschreibung.split(" - ")
-            kursname = teile[0]
-            status = teile[1]
-            
-        # Wenn mehrere Termine vorhanden sind, handelt es sich um einen Zeitraum
-        if len(termine) >= 2:
-            # Sortiere die Termine (falls sie nicht in chronologischer Reihenfolge sind)
-            termine.sort()
-            # Erstelle einen Zeitraum vom ersten bis zum letzten Termin
-            termin_zeitraum = f"{termine[0]} - {termine[-1]}"
-            gefundene_termine.append({
-                "termin": termin_zeitraum,
-                "beschreibung": beschreibung,
-                "ort": ort,
-                "kursname": kursname,
-                "status": status
-            })
-        else:
-            # Bei nur einem Termin, diesen direkt verwenden
-            for termin in termine:
-                gefundene_termine.append({
-                    "termin": termin,
-                    "beschreibung": beschreibung,
-                    "ort": ort,
-                    "kursname": kursname,
-                    "status": status
-                })
+        eintraege = extrahiere_zeile(row)
+        if passt_zu_suchbegriffen(eintraege, suchbegriffe):
+            gefundene_termine.extend(eintraege)
+    
+    return gefundene_termine
+
+def teile_tabellenzeilen(html):
+    """Zerlegt die erste Tabelle der Seite in das rohe Markup ihrer Zeilen
+    
+    Returns:
+        list: Markup der Zeilen oder None, wenn sich die Tabelle nicht sicher
+        zerlegen lässt (keine Tabelle, verschachtelte Tabellen, nicht
+        geschlossene Zeilen)
+    """
+    start = TABELLE_START.search(html)
+    if not start:
+        return None
+    ende = TABELLE_ENDE.search(html, start.end())
+    if not ende:
+        return None
+    tabelle = html[start.end():ende.start()]
+    if TABELLE_START.search(tabelle):
+        return None
+    
+    zeilen = ZEILE.findall(tabelle)
+    if len(zeilen) != len(ZEILE_START.findall(tabelle)):
+        return None
+    return zeilen
+
+def extrahiere_termine(html, suchbegriffe, zeilen_cache):
+    """Extrahiert Termine aus der Seite und nutzt dabei den Zeilen-Cache
+    
+    Nur neue oder geänderte Zeilen werden mit BeautifulSoup ausgewertet; für
+    unveränderte Zeilen werden die gespeicherten Einträge übernommen. Lässt
+    sich die Tabelle nicht zeilenweise zerlegen, wird die ganze Seite wie
+    bisher ausgewertet.
+    """
+    zeilen = teile_tabellenzeilen(html)
+    if zeilen is None:
+        logger.info("Tabelle nicht zeilenweise zerlegbar, werte gesamte Seite ohne Zeilen-Cache aus")
+        return extrahiere_termine_aus_tabelle(BeautifulSoup(html, "lxml"), suchbegriffe)
+    
+    if len(zeilen) <= 1:
+        logger.warning("Keine Datenzeilen in der Tabelle gefunden")
+        return []
+    
+    # Unbekannte Zeilen gemeinsam in einem Dokument auswerten
+    fingerabdruecke = [zeilen_cache.fingerabdruck(markup) for markup in zeilen]
+    ergebnisse = [zeilen_cache.holen(fingerabdruck) for fingerabdruck in fingerabdruecke]
+    neue_zeilen = [i for i, ergebnis in enumerate(ergebnisse) if ergebnis is None]
+    if neue_zeilen:
+        soup = BeautifulSoup("<table>" + "".join(zeilen[i] for i in neue_zeilen) + "</table>", "lxml")
+        rows = soup.find_all("tr")
+        if len(rows) != len(neue_zeilen):
+            # Sicherheitshalber jede Zeile einzeln auswerten
+            rows = [BeautifulSoup(f"<table>{zeilen[i]}</table>", "lxml").find("tr") for i in neue_zeilen]
+        for i, row in zip(neue_zeilen, rows):
+            eintraege = extrahiere_zeile(row) if row else []
+            treffer = passt_zu_suchbegriffen(eintraege, suchbegriffe)
+            zeilen_cache.ablegen(fingerabdruecke[i], eintraege, treffer)
+            ergebnisse[i] = (eintraege, treffer)
+    
+    gefundene_termine = []
+    for fingerabdruck, (eintraege, treffer) in zip(fingerabdruecke, ergebnisse):
+        if treffer is None:
+            # Suchbegriffe haben sich geändert, nur den Abgleich wiederholen
+            treffer = passt_zu_suchbegriffen(eintraege, suchbegriffe)
+            zeilen_cache.ablegen(fingerabdruck, eintraege, treffer)
+        if treffer:
+            gefundene_termine.extend(eintraege)
     
     return gefundene_termine
 
@@ -174,48 +243,90 @@ def main():
     # Umgebungsvariablen laden
     load_dotenv("config/.env")
     
+    # Profiling nur bei --profile bzw. PROFILE=True, sonst ohne Mehraufwand
+    profiler = erstelle_profiler("monitor")
+    try:
+        ueberwache(profiler)
+    except SperreBelegtError as e:
+        logger.warning(f"{e}, dieser Lauf wird übersprungen")
+    except (OSError, ValueError) as e:
+        # Nichts schreiben, sonst ginge der bisherige Bestand verloren
+        logger.error(f"Monitor abgebrochen, {JSON_FILE} bleibt unverändert: {e}")
+        return 1
+    finally:
+        profiler.abschliessen()
+    return 0
+
+def ueberwache(profiler):
+    """Ruft die Webseite ab und speichert neue Lehrgänge"""
     # Suchbegriffe laden
     suchbegriffe = hole_suchbegriffe()
     
-    # Webseite abrufen
-    logger.info(f"Rufe Webseite ab: {URL}")
+    # Webseite abrufen (MONITOR_URL z.B. für Lasttests mit einem lokalen Server)
+    url = os.getenv("MONITOR_URL", URL)
+    logger.info(f"Rufe Webseite ab: {url}")
     try:
-        # SSL-Verifizierung deaktivieren, falls Zertifikatsprobleme auftreten
-        response = requests.get(URL, verify=False)
-        response.encoding = "utf-8"
-        soup = BeautifulSoup(response.text, "lxml")
+        with profiler.stufe("abruf"):
+            # SSL-Verifizierung deaktivieren, falls Zertifikatsprobleme auftreten
+            timeout = float(os.getenv("REQUEST_TIMEOUT", REQUEST_TIMEOUT))
+            response = requests.get(url, verify=False, timeout=timeout)
+            # Fehlerseiten (z.B. 503) nicht als leere Tabelle auswerten
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            html = response.text
     except Exception as e:
         logger.error(f"Fehler beim Abrufen der Webseite: {e}")
         return
 
-    # Termine extrahieren
-    gefundene_termine = extrahiere_termine_aus_tabelle(soup, suchbegriffe)
+    # Termine extrahieren, unveränderte Zeilen aus dem Cache übernehmen. Die Sperre
+    # verhindert, dass parallele Läufe für dieselbe Seite den Cache überschreiben.
+    cache_datei = zeilen_cache_datei(url)
+    with datei_sperre(cache_datei), profiler.stufe("parsen", speicher=True):
+        zeilen_cache = ZeilenCache(cache_datei, suchbegriffe)
+        gefundene_termine = extrahiere_termine(html, suchbegriffe, zeilen_cache)
+        entfernt = zeilen_cache.speichern()
+    treffer, fehlschlaege, quote = zeilen_cache.statistik()
+    logger.info(f"Zeilen-Cache: {treffer} Treffer, {fehlschlaege} neu ausgewertet "
+                f"(Trefferquote {quote:.1f}%), {entfernt} veraltete Zeilen entfernt")
     
-    # Vorhandene Daten laden
-    daten = lade_json(JSON_FILE)
-    vorhandene_keys = set(erstelle_key(e["termin"], e["beschreibung"]) for e in daten)
-    
-    # Neue Einträge identifizieren
-    neue_eintraege = []
-    for termin in gefundene_termine:
-        key = erstelle_key(termin["termin"], termin["beschreibung"])
-        if key not in vorhandene_keys:
+    # Lesen, Ergänzen und Schreiben unter Sperre, damit parallele Läufe sich nicht überschreiben
+    with datei_sperre(JSON_FILE), profiler.stufe("speichern"):
+        # Vorhandene Daten laden
+        daten = lade_eintraege(lade_json(JSON_FILE))
+        vorhandene_keys = set(e.schluessel for e in daten)
+        
+        # Neue Einträge identifizieren. Bereits abgelaufene Lehrgänge werden nicht
+        # aufgenommen: sie wurden ggf. schon in die Historie verschoben und würden
+        # sonst erneut gemeldet, wenn sie noch auf der Webseite stehen. Maßgeblich
+        # ist auch der Stichtag, den die Kompaktierung tatsächlich verwendet hat.
+        grenze = wirksamer_stichtag(HISTORIE_FILE)
+        neue_eintraege = []
+        abgelaufen = 0
+        for termin in gefundene_termine:
+            key = termin.schluessel
+            if key in vorhandene_keys:
+                continue
+            if ist_abgelaufen(termin, grenze):
+                abgelaufen += 1
+                continue
             neue_eintraege.append(termin)
             vorhandene_keys.add(key)
 
-    # Neue Einträge speichern
-    if neue_eintraege:
-        daten.extend(neue_eintraege)
-        speichere_json(JSON_FILE, daten)
-        logger.info(f"{len(neue_eintraege)} neue Einträge gespeichert.")
-    else:
-        logger.info("Keine neuen Einträge gefunden.")
+        # Neue Einträge speichern
+        if neue_eintraege:
+            daten.extend(neue_eintraege)
+            speichere_json(JSON_FILE, daten)
+            logger.info(f"{len(neue_eintraege)} neue Einträge gespeichert.")
+        else:
+            logger.info("Keine neuen Einträge gefunden.")
     
     # Statistik ausgeben
     logger.info(f"Insgesamt {len(gefundene_termine)} passende Einträge gefunden.")
     logger.info(f"Davon {len(neue_eintraege)} neue Einträge.")
+    if abgelaufen:
+        logger.info(f"{abgelaufen} bereits abgelaufene Einträge übersprungen.")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
 # Made with Bob
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Query Server
+
+Dieser Server stellt die gespeicherten Lehrgänge über eine schreibgeschützte
+HTTP-Schnittstelle als JSON bereit. Die termine.json wird nur einmal geladen
+und im Speicher indiziert; Änderungen durch den Monitor werden automatisch
+nachgeladen.
+
+Beispiele:
+    GET /termine
+    GET /termine?kursname=Atemschutzgeräteträger&status=eingeladen
+    GET /termine?datum=2025-10-11
+    GET /termine?von=01.10.2025&bis=31.12.2025&ort=Nürtingen
+    GET /status
+    GET /kalender/lehrgaenge.ics
+"""
+
+import os
+import sys
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv
+
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.kurs_index import KursIndex
+from src.utils.termin_datum import parse_datum
+
+# Logging konfigurieren
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("logs/query_server.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("QueryServer")
+
+# Konstanten
+JSON_FILE = "data/termine.json"
+ICS_DIR = "data/kalender"
+TEXT_FILTER = ("kursname", "status", "ort", "text")
+DATUM_FILTER = ("datum", "von", "bis")
+
+def lese_filter(query):
+    """Wandelt die Query-Parameter in Filter für den Index um
+
+    Raises:
+        ValueError: Bei unbekannten Parametern oder ungültigen Datumsangaben
+    """
+    parameter = parse_qs(query, keep_blank_values=False)
+    filter_werte = {}
+    for name, werte in parameter.items():
+        wert = werte[-1]
+        if name in TEXT_FILTER:
+            filter_werte[name] = wert
+        elif name in DATUM_FILTER:
+            filter_werte[name] = parse_datum(wert)
+        else:
+            raise ValueError(f"Unbekannter Parameter: {name}")
+    return filter_werte
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Beantwortet GET-Anfragen auf /termine, /status und /kalender"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LehrgangsMelder"
+    index = None
+
+    def do_GET(self):
+        teile = urlsplit(self.path)
+        self.index.aktualisieren()
+
+        if teile.path == "/status":
+            body = json.dumps({
+                "eintraege": len(self.index),
+                "generation": self.index.generation
+            }).encode("utf-8")
+            self._sende(200, body)
+            return
+
+        if teile.path.startswith("/kalender/"):
+            self._sende_kalender(os.path.basename(teile.path))
+            return
+
+        if teile.path != "/termine":
+            self._sende_fehler(404, "Unbekannter Pfad")
+            return
+
+        try:
+            filter_werte = lese_filter(teile.query)
+        except ValueError as e:
+            self._sende_fehler(400, str(e))
+            return
+
+        body, etag = self.index.antwort(filter_werte)
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self._sende(304, None, etag)
+            return
+        self._sende(200, body, etag)
+
+    def _sende_kalender(self, dateiname):
+        """Liefert eine vom Kalender-Feed erzeugte .ics-Datei mit ihrem ETag aus"""
+        datei = os.path.join(os.getenv("ICS_DIR", ICS_DIR), dateiname)
+        if not dateiname.endswith(".ics") or not os.path.isfile(datei):
+            self._sende_fehler(404, "Kalender nicht gefunden")
+            return
+        etag = None
+        if os.path.exists(f"{datei}.etag"):
+            with open(f"{datei}.etag", "r", encoding="utf-8") as f:
+                etag = f.read().strip()
+        if etag and etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self._sende(304, None, etag)
+            return
+        with open(datei, "rb") as f:
+            body = f.read()
+        self._sende(200, body, etag, "text/calendar; charset=utf-8")
+
+    def _sende(self, code, body, etag=None, content_type="application/json; charset=utf-8"):
+        """Sendet eine Antwort mit optionalem Body und ETag"""
+        self.send_response(code)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if body is not None:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        else:
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+    def _sende_fehler(self, code, meldung):
+        """Sendet eine Fehlermeldung als JSON"""
+        body = json.dumps({"fehler": meldung}, ensure_ascii=False).encode("utf-8")
+        self._sende(code, body)
+
+    def log_message(self, format, *args):
+        # Einzelne Anfragen nur im Debug-Level protokollieren
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def main():
+    """Hauptfunktion"""
+    # Umgebungsvariablen laden
+    load_dotenv("config/.env")
+
+    host = os.getenv("API_HOST", "127.0.0.1")
+    port = int(os.getenv("API_PORT", "8080"))
+
+    index = KursIndex(JSON_FILE)
+    index.aktualisieren(erzwingen=True)
+    QueryHandler.index = index
+
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    logger.info(f"Query-Server läuft auf http://{host}:{port} ({len(index)} Einträge)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Query-Server wird beendet")
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# Made with Bob
@@ -5,15 +5,23 @@
 Run Monitor and Notify
 
 Dieses Skript führt den Website-Monitor und den Mail-Notifier nacheinander aus,
-um neue Lehrgänge zu finden und Benachrichtigungen zu senden.
+um neue Lehrgänge zu finden und Benachrichtigungen zu senden. Anschließend wird
+der Kalender-Feed aktualisiert und abgelaufene Lehrgänge werden in die Historie
+verschoben.
 """
 
 import os
 import sys
+import shlex
 import subprocess
 import logging
 from datetime import datetime
 
+# Füge das Hauptverzeichnis zum Pfad hinzu, damit wir die Module importieren können
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.dateisperre import EinzelinstanzSperre
+from src.utils.profiling import erstelle_profiler
+
 # Logging konfigurieren
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +33,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger("RunMonitorAndNotify")
 
+# Konstanten
+INSTANZ_SPERRE = "data/run_monitor_and_notify.lock"
+BEFEHL_TIMEOUT = 900
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def skript_befehl(skript):
+    """Befehl zum Ausführen eines Skripts aus bin/ mit demselben Python-Interpreter"""
+    return f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(BIN_DIR, skript))}"
+
 def run_command(command):
     """Führt einen Befehl aus und gibt das Ergebnis zurück"""
     logger.info(f"Führe Befehl aus: {command}")
@@ -35,7 +52,8 @@ def run_command(command):
             check=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True
+            text=True,
+            timeout=int(os.getenv("BEFEHL_TIMEOUT", BEFEHL_TIMEOUT))
         )
         logger.info(f"Befehl erfolgreich ausgeführt: {result.stdout.strip()}")
         return True, result.stdout
@@ -43,9 +61,32 @@ def run_command(command):
         logger.error(f"Fehler beim Ausführen des Befehls: {e}")
         logger.error(f"Fehlerausgabe: {e.stderr}")
         return False, e.stderr
+    except subprocess.TimeoutExpired as e:
+        logger.error(f"Zeitüberschreitung beim Ausführen des Befehls: {e}")
+        return False, ""
 
 def main():
     """Hauptfunktion"""
+    # Überlappende Läufe (z.B. per Cron bei langsamer Webseite) verhindern.
+    # Über INSTANZ_SPERRE kann z.B. je Seitengruppe eine eigene Sperre verwendet werden.
+    sperre = EinzelinstanzSperre(os.getenv("INSTANZ_SPERRE", INSTANZ_SPERRE))
+    if not sperre.erwerben():
+        logger.warning("Ein anderer Lauf ist noch aktiv, dieser Lauf wird übersprungen")
+        return 0
+    profiler = erstelle_profiler("run_monitor_and_notify")
+    if profiler.aktiv:
+        # Die einzelnen Skripte erben die Einstellung über die Umgebung
+        os.environ["PROFILE"] = "True"
+        if profiler.speicher:
+            os.environ["PROFILE_MEMORY"] = "True"
+    try:
+        return fuehre_aus(profiler)
+    finally:
+        profiler.abschliessen()
+        sperre.freigeben()
+
+def fuehre_aus(profiler):
+    """Führt Monitor, Mail-Notifier, Kalender-Feed und Kompaktierung nacheinander aus"""
     logger.info("Starte den Prozess zur Überwachung und Benachrichtigung")
     
     # Aktuelles Verzeichnis speichern
@@ -58,18 +99,34 @@ def main():
     
     # 1. Monitor ausführen
     logger.info("1. Führe monitor.py aus...")
-    success, output = run_command("python bin/monitor.py")
+    with profiler.stufe("monitor"):
+        success, output = run_command(skript_befehl("monitor.py"))
     if not success:
         logger.error("Fehler beim Ausführen von monitor.py")
         return 1
     
     # 2. Mail-Notifier ausführen
     logger.info("2. Führe mail_notifier.py aus...")
-    success, output = run_command("python bin/mail_notifier.py")
+    with profiler.stufe("mail_notifier"):
+        success, output = run_command(skript_befehl("mail_notifier.py"))
     if not success:
         logger.error("Fehler beim Ausführen von mail_notifier.py")
         return 1
     
+    # 3. Kalender-Feed aktualisieren (ein Fehler hier verhindert keine Benachrichtigung)
+    logger.info("3. Führe ical_feed.py aus...")
+    with profiler.stufe("ical_feed"):
+        success, output = run_command(skript_befehl("ical_feed.py"))
+    if not success:
+        logger.warning("Fehler beim Ausführen von ical_feed.py, Kalender-Feed nicht aktualisiert")
+    
+    # 4. Abgelaufene Lehrgänge in die Historie verschieben (ebenfalls nicht kritisch)
+    logger.info("4. Führe kompaktierung.py aus...")
+    with profiler.stufe("kompaktierung"):
+        success, output = run_command(skript_befehl("kompaktierung.py"))
+    if not success:
+        logger.warning("Fehler beim Ausführen von kompaktierung.py, abgelaufene Lehrgänge nicht verschoben")
+    
     # Erfolgsmeldung
     logger.info("Prozess erfolgreich abgeschlossen")
     return 0
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Aufbewahrung
+
+Regeln und Hilfsfunktionen, um vergangene Lehrgänge aus dem aktiven Bestand
+(termine.json, last_sent.json) in eine komprimierte Historie zu verschieben.
+Ein Lehrgang gilt als abgelaufen, wenn sein letzter Tag länger als die
+Karenzzeit zurückliegt. Lehrgänge ohne erkennbares Datum laufen nie ab.
+
+Die Historie ist eine gzip-Datei mit einem JSON-Objekt pro Zeile. Jede
+Kompaktierung hängt ein weiteres gzip-Member an; beim Lesen werden alle
+Member nacheinander gelesen. Daneben liegt eine Datei <historie>.stand, in der
+die Länge der vollständig geschriebenen Historie und der höchste bisher
+verwendete Stichtag stehen. Alles, was vor diesem Tag
+geendet hat, kann bereits in der Historie liegen und darf vom Monitor nicht
+erneut aufgenommen werden.
+"""
+
+import io
+import os
+import gzip
+import zlib
+import json
+import datetime
+import logging
+
+from .dateisperre import schreibe_atomar
+from .termin_datum import parse_termin
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.Aufbewahrung")
+
+KARENZ_TAGE = 30
+
+def stichtag(karenz_tage=None, heute=None):
+    """Ermittelt den Stichtag: Lehrgänge, die vor diesem Tag geendet haben, sind abgelaufen.
+
+    Args:
+        karenz_tage (int): Karenzzeit in Tagen (Standard: AUFBEWAHRUNG_KARENZ_TAGE bzw. 30)
+        heute (datetime.date): Bezugstag (Standard: heute)
+
+    Returns:
+        datetime.date: Der Stichtag
+
+    Raises:
+        ValueError: Bei negativer Karenzzeit (der Stichtag läge in der Zukunft)
+    """
+    if karenz_tage is None:
+        karenz_tage = int(os.getenv("AUFBEWAHRUNG_KARENZ_TAGE", KARENZ_TAGE))
+    if karenz_tage < 0:
+        raise ValueError(f"Karenzzeit darf nicht negativ sein: {karenz_tage}")
+    heute = heute or datetime.date.today()
+    return heute - datetime.timedelta(days=karenz_tage)
+
+def _stand_datei(historie_datei):
+    return f"{historie_datei}.stand"
+
+def lese_stand(historie_datei):
+    """Lädt den Stand der Historie (leer, wenn noch nichts archiviert wurde)"""
+    datei = _stand_datei(historie_datei)
+    if not os.path.exists(datei):
+        return {}
+    try:
+        with open(datei, "r", encoding="utf-8") as f:
+            stand = json.load(f)
+        return stand if isinstance(stand, dict) else {}
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Stand der Historie {datei} nicht lesbar: {e}")
+        return {}
+
+def archiv_stichtag(historie_datei):
+    """Höchster Stichtag, mit dem bisher Lehrgänge in die Historie verschoben wurden
+
+    Returns:
+        datetime.date oder None
+    """
+    wert = lese_stand(historie_datei).get("stichtag")
+    try:
+        return datetime.date.fromisoformat(wert) if wert else None
+    except ValueError:
+        return None
+
+def merke_stichtag(historie_datei, grenze):
+    """Hält fest, dass Lehrgänge mit Ende vor grenze archiviert wurden (der Stichtag sinkt nie)"""
+    stand = lese_stand(historie_datei)
+    bisher = archiv_stichtag(historie_datei)
+    if bisher is not None and bisher >= grenze:
+        return
+    stand["stichtag"] = grenze.isoformat()
+    schreibe_atomar(_stand_datei(historie_datei), json.dumps(stand))
+
+def wirksamer_stichtag(historie_datei, karenz_tage=None):
+    """Stichtag für den Monitor: der spätere aus eigener Karenzzeit und archiviertem Stichtag
+
+    So werden bereits archivierte Lehrgänge auch dann nicht erneut aufgenommen,
+    wenn die Kompaktierung mit einer kürzeren Karenzzeit lief.
+    """
+    grenze = stichtag(karenz_tage)
+    archiviert = archiv_stichtag(historie_datei)
+    return max(grenze, archiviert) if archiviert else grenze
+
+def ist_abgelaufen(eintrag, grenze):
+    """Prüft, ob der Lehrgang vor dem Stichtag geendet hat"""
+    _, ende = parse_termin(eintrag.termin)
+    return ende is not None and ende < grenze
+
+def teile_nach_ablauf(eintraege, grenze):
+    """Teilt Einträge in aktive und abgelaufene auf.
+
+    Returns:
+        tuple: (aktive Einträge, abgelaufene Einträge)
+    """
+    aktiv = []
+    abgelaufen = []
+    for eintrag in eintraege:
+        (abgelaufen if ist_abgelaufen(eintrag, grenze) else aktiv).append(eintrag)
+    return aktiv, abgelaufen
+
+def historien_datensatz(eintrag, benachrichtigt, archiviert_am):
+    """Erstellt den Datensatz eines Lehrgangs für die Historie"""
+    datensatz = eintrag.als_dict()
+    datensatz["benachrichtigt"] = benachrichtigt
+    datensatz["archiviert_am"] = archiviert_am
+    return datensatz
+
+class _BegrenzteDatei(io.RawIOBase):
+    """Liest aus einer geöffneten Datei höchstens die angegebene Anzahl Bytes"""
+
+    def __init__(self, datei, laenge):
+        self._datei = datei
+        self._rest = laenge
+
+    def readable(self):
+        return True
+
+    def readinto(self, puffer):
+        if self._rest <= 0:
+            return 0
+        anzahl = self._datei.readinto(memoryview(puffer)[:min(len(puffer), self._rest)])
+        self._rest -= anzahl
+        return anzahl
+
+def _pruefe_laenge(datei, block_groesse=65536):
+    """Ermittelt die Länge des Anfangs der Historie, der nur aus vollständigen Blöcken besteht.
+
+    Wird nur benötigt, wenn der Stand keine (passende) Länge enthält, z.B. bei
+    einer Historie aus einer älteren Version oder nach Verlust des Stands.
+    Jeder Block wird vollständig entpackt und jede Zeile als JSON geprüft.
+    """
+    gueltig = 0
+    position = 0
+    with open(datei, "rb") as f:
+        entpacker = zlib.decompressobj(wbits=31)
+        zeilenrest = b""
+        daten = f.read(block_groesse)
+        while daten:
+            try:
+                zeilen = (zeilenrest + entpacker.decompress(daten)).split(b"\n")
+                zeilenrest = zeilen.pop()
+                for zeile in zeilen:
+                    if zeile.strip():
+                        json.loads(zeile)
+            except (zlib.error, ValueError):
+                break
+            if not entpacker.eof:
+                position += len(daten)
+                daten = f.read(block_groesse)
+                continue
+            if zeilenrest.strip():
+                break
+            gueltig = position + len(daten) - len(entpacker.unused_data)
+            position = gueltig
+            daten = entpacker.unused_data or f.read(block_groesse)
+            entpacker = zlib.decompressobj(wbits=31)
+            zeilenrest = b""
+    return gueltig
+
+def gueltige_laenge(datei, stand=None):
+    """Länge der vollständig geschriebenen Historie in Bytes
+
+    Maßgeblich ist die im Stand vermerkte Länge. Fehlt sie oder passt sie nicht
+    zur Datei, wird die Historie einmal vollständig geprüft.
+
+    Args:
+        datei (str): Pfad zur Historie (.jsonl.gz)
+        stand (dict): Bereits geladener Stand (Standard: wird gelesen)
+
+    Returns:
+        int: Anzahl der gültigen Bytes am Anfang der Datei (0, wenn sie fehlt)
+    """
+    if not os.path.exists(datei):
+        return 0
+    groesse = os.path.getsize(datei)
+    laenge = (lese_stand(datei) if stand is None else stand).get("groesse")
+    if isinstance(laenge, int) and 0 <= laenge <= groesse:
+        return laenge
+    if laenge is not None:
+        logger.warning(f"Länge im Stand der Historie {datei} passt nicht zur Datei, Historie wird geprüft")
+    return _pruefe_laenge(datei)
+
+def haenge_an_historie(datei, datensaetze):
+    """Hängt Datensätze als neues gzip-Member an das Ende der Historie an.
+
+    Die bestehende Historie wird nicht umkopiert, der Aufwand hängt also nur von
+    der Anzahl der neuen Datensätze ab. Vor dem Anhängen wird die Länge der
+    vollständig geschriebenen Datei im Stand vermerkt und ein bei einem Abbruch
+    unvollständig geschriebenes Member entfernt; Leser lesen nur bis zu dieser
+    Länge. Da die Lehrgänge erst danach aus termine.json entfernt werden, gehen
+    sie bei einem Abbruch nicht verloren.
+
+    Args:
+        datei (str): Pfad zur Historie (.jsonl.gz)
+        datensaetze (list): Anzuhängende Datensätze (dicts)
+    """
+    if not datensaetze:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(datei)), exist_ok=True)
+    stand = lese_stand(datei)
+    gueltig = gueltige_laenge(datei, stand)
+    with open(datei, "ab") as f:
+        vorhanden = os.fstat(f.fileno()).st_size
+        if gueltig < vorhanden:
+            logger.warning(f"Unvollständiges Ende der Historie {datei} entfernt ({vorhanden - gueltig} Bytes)")
+            os.ftruncate(f.fileno(), gueltig)
+        if stand.get("groesse") != gueltig:
+            stand["groesse"] = gueltig
+            schreibe_atomar(_stand_datei(datei), json.dumps(stand))
+        with gzip.GzipFile(fileobj=f, mode="wb") as member:
+            for datensatz in datensaetze:
+                zeile = json.dumps(datensatz, ensure_ascii=False, separators=(",", ":")) + "\n"
+                member.write(zeile.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+        stand["groesse"] = os.fstat(f.fileno()).st_size
+    schreibe_atomar(_stand_datei(datei), json.dumps(stand))
+
+def lese_historie(datei):
+    """Liest die Datensätze der Historie nacheinander.
+
+    Gelesen wird nur die vollständig geschriebene Länge; ein gerade angehängter
+    oder bei einem Abbruch unvollständig gebliebener Block wird übersprungen.
+
+    Yields:
+        dict: Datensatz mit termin, beschreibung, ort, benachrichtigt und archiviert_am
+    """
+    if not os.path.exists(datei):
+        return
+    laenge = gueltige_laenge(datei)
+    try:
+        with open(datei, "rb") as roh, gzip.GzipFile(fileobj=_BegrenzteDatei(roh, laenge)) as entpackt:
+            for zeile in io.TextIOWrapper(entpackt, encoding="utf-8"):
+                if zeile.strip():
+                    yield json.loads(zeile)
+    except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        # Sollte nur bei einer nachträglich veränderten Datei vorkommen
+        logger.warning(f"Historie {datei} ab hier nicht lesbar, Rest wird übersprungen: {e}")
+
+# Made with Bob
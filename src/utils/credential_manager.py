@@ -17,22 +17,31 @@ logger = logging.getLogger("WebsiteMonitor.CredentialManager")
 class CredentialManager:
     """Verwaltet die sicheren Credentials für die Anwendung."""
     
-    def __init__(self, key_file="secret.key"):
+    def __init__(self, key_file="secret.key", create_if_missing=True):
         """Initialisiert den Credential Manager.
         
         Args:
             key_file (str): Pfad zur Datei mit dem Verschlüsselungsschlüssel
+            create_if_missing (bool): Neuen Schlüssel erzeugen, wenn die Datei fehlt.
+                Beim reinen Lesen von Credentials sollte False übergeben werden.
         """
         self.key_file = key_file
+        self.create_if_missing = create_if_missing
         self.key = self._load_or_generate_key()
         self.cipher_suite = Fernet(self.key)
         
     def _load_or_generate_key(self):
-        """Lädt einen existierenden Schlüssel oder generiert einen neuen."""
+        """Lädt einen existierenden Schlüssel oder generiert einen neuen.
+        
+        Raises:
+            FileNotFoundError: Wenn die Datei fehlt und create_if_missing False ist
+        """
         try:
             if os.path.exists(self.key_file):
                 with open(self.key_file, "rb") as key_file:
                     return key_file.read()
+            elif not self.create_if_missing:
+                raise FileNotFoundError(f"Schlüsseldatei {self.key_file} nicht gefunden")
             else:
                 key = Fernet.generate_key()
                 with open(self.key_file, "wb") as key_file:
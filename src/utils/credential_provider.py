@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Credential Provider
+
+Diese Klasse stellt die SMTP-Credentials für den Versand bereit. Die Quelle
+(Umgebungsvariablen oder verschlüsselte Datei) wird einmal bestimmt; die Datei
+wird erst beim ersten Zugriff entschlüsselt und das Ergebnis im Speicher
+gehalten, bis die Gültigkeitsdauer abläuft oder sich Schlüssel- bzw.
+Credential-Datei ändern. Ein fehlender Schlüssel wird nie neu erzeugt.
+"""
+
+import os
+import time
+import logging
+import threading
+
+from .credential_manager import CredentialManager
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.CredentialProvider")
+
+KEY_FILE = "secret.key"
+CREDENTIALS_FILE = "config/smtp_credentials.enc"
+CACHE_TTL = 3600.0
+
+QUELLE_UMGEBUNG = "Umgebungsvariablen"
+QUELLE_DATEI = "verschlüsselte Datei"
+
+def _datei_stand(datei):
+    """Änderungszeit und Größe einer Datei (None, wenn sie fehlt)"""
+    try:
+        stat = os.stat(datei)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+class CredentialProvider:
+    """Liefert SMTP-Benutzername und -Passwort mit Zwischenspeicherung."""
+
+    def __init__(self, key_file=KEY_FILE, credentials_file=CREDENTIALS_FILE, ttl=CACHE_TTL):
+        """Initialisiert den Provider.
+
+        Args:
+            key_file (str): Pfad zur Datei mit dem Verschlüsselungsschlüssel
+            credentials_file (str): Pfad zur Datei mit den verschlüsselten Credentials
+            ttl (float): Gültigkeitsdauer der entschlüsselten Credentials in Sekunden
+        """
+        # Pfade einmal auflösen, damit ein späterer Verzeichniswechsel nichts ändert
+        self.key_file = os.path.abspath(key_file)
+        self.credentials_file = os.path.abspath(credentials_file)
+        self.ttl = ttl
+        self.quelle = None
+        self._credentials = None
+        self._geladen_um = 0.0
+        self._stand = None
+        self._lock = threading.Lock()
+
+    def _bestimme_quelle(self):
+        """Legt einmalig fest, woher die Credentials stammen"""
+        username = os.getenv("SMTP_USERNAME")
+        password = os.getenv("SMTP_PASSWORD")
+        if username and password:
+            self.quelle = QUELLE_UMGEBUNG
+            self._credentials = (username, password)
+        else:
+            self.quelle = QUELLE_DATEI
+        logger.info(f"SMTP-Anmeldedaten werden aus {self.quelle} geladen")
+
+    def _ist_aktuell(self, stand):
+        """Prüft, ob die zwischengespeicherten Credentials noch verwendet werden dürfen"""
+        if self._credentials is None or stand != self._stand:
+            return False
+        return time.monotonic() - self._geladen_um < self.ttl
+
+    def get_credentials(self):
+        """Liefert die SMTP-Credentials.
+
+        Returns:
+            tuple: (username, password)
+
+        Raises:
+            FileNotFoundError: Wenn Schlüssel- oder Credential-Datei fehlen
+            cryptography.fernet.InvalidToken: Wenn die Datei nicht entschlüsselt werden kann
+        """
+        with self._lock:
+            if self.quelle is None:
+                self._bestimme_quelle()
+            if self.quelle == QUELLE_UMGEBUNG:
+                return self._credentials
+
+            stand = (_datei_stand(self.key_file), _datei_stand(self.credentials_file))
+            if self._ist_aktuell(stand):
+                return self._credentials
+
+            if stand[0] is None:
+                raise FileNotFoundError(f"Schlüsseldatei {self.key_file} nicht gefunden")
+            if stand[1] is None:
+                raise FileNotFoundError(f"Credential-Datei {self.credentials_file} nicht gefunden")
+
+            self._credentials = None
+            manager = CredentialManager(self.key_file, create_if_missing=False)
+            self._credentials = manager.load_credentials(self.credentials_file)
+            self._geladen_um = time.monotonic()
+            self._stand = stand
+            logger.info("SMTP-Anmeldedaten aus verschlüsselter Datei entschlüsselt")
+            return self._credentials
+
+    def invalidate(self):
+        """Verwirft die zwischengespeicherten Credentials und die gewählte Quelle"""
+        with self._lock:
+            self.quelle = None
+            self._credentials = None
+            self._stand = None
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_credential_provider():
+    """Liefert den gemeinsamen Provider des Prozesses.
+
+    Die Gültigkeitsdauer kann über CREDENTIAL_CACHE_TTL (Sekunden) festgelegt werden.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = CredentialProvider(ttl=float(os.getenv("CREDENTIAL_CACHE_TTL", str(CACHE_TTL))))
+        return _provider
+
+# Made with Bob
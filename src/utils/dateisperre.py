@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dateisperre
+
+Hilfsfunktionen für den sicheren gleichzeitigen Zugriff mehrerer Prozesse auf
+die Datendateien: atomares Schreiben, Sperren für Lesen-Ändern-Schreiben und
+eine Sperre gegen mehrfach gleichzeitig laufende Instanzen.
+"""
+
+import os
+import time
+import socket
+import logging
+import tempfile
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.Dateisperre")
+
+SPERRE_TIMEOUT = 60.0
+
+class SperreBelegtError(RuntimeError):
+    """Wird ausgelöst, wenn eine Sperre nicht rechtzeitig erhalten werden kann."""
+
+def schreibe_atomar(datei, inhalt, modus="w"):
+    """Schreibt eine Datei über eine temporäre Datei und ersetzt das Ziel atomar.
+
+    Leser sehen so immer entweder den alten oder den neuen, vollständigen Inhalt.
+
+    Args:
+        datei (str): Zieldatei
+        inhalt (str|bytes): Neuer Inhalt
+        modus (str): "w" für Text (UTF-8), "wb" für Bytes
+    """
+    verzeichnis = os.path.dirname(os.path.abspath(datei))
+    os.makedirs(verzeichnis, exist_ok=True)
+    fd, tmp_datei = tempfile.mkstemp(dir=verzeichnis, prefix=".tmp_", suffix=os.path.basename(datei))
+    try:
+        if "b" in modus:
+            f = os.fdopen(fd, modus)
+        else:
+            f = os.fdopen(fd, modus, encoding="utf-8", newline="")
+        with f:
+            f.write(inhalt)
+            f.flush()
+            os.fsync(f.fileno())
+        # Zugriffsrechte der bestehenden Datei beibehalten
+        if os.path.exists(datei):
+            os.chmod(tmp_datei, os.stat(datei).st_mode & 0o777)
+        else:
+            os.chmod(tmp_datei, 0o644)
+        os.replace(tmp_datei, datei)
+    except BaseException:
+        if os.path.exists(tmp_datei):
+            os.remove(tmp_datei)
+        raise
+
+@contextlib.contextmanager
+def datei_sperre(datei, exklusiv=True, timeout=None):
+    """Hält eine advisory Sperre (fcntl.flock) für eine Datendatei.
+
+    Gesperrt wird eine separate Datei <datei>.lock, da die Datendatei selbst
+    beim atomaren Schreiben ersetzt wird. Auf Systemen ohne fcntl wird nicht
+    gesperrt.
+
+    Args:
+        datei (str): Zu schützende Datei
+        exklusiv (bool): Exklusive Sperre (Schreiben) statt geteilter (Lesen)
+        timeout (float): Maximale Wartezeit in Sekunden (Standard: SPERRE_TIMEOUT bzw. 60)
+
+    Raises:
+        SperreBelegtError: Wenn die Sperre nicht innerhalb des Timeouts frei wird
+    """
+    if fcntl is None:
+        yield
+        return
+
+    if timeout is None:
+        timeout = float(os.getenv("SPERRE_TIMEOUT", SPERRE_TIMEOUT))
+    lock_datei = f"{datei}.lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_datei)), exist_ok=True)
+    art = fcntl.LOCK_EX if exklusiv else fcntl.LOCK_SH
+    with open(lock_datei, "a") as f:
+        frist = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(f.fileno(), art | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= frist:
+                    raise SperreBelegtError(f"Sperre für {datei} nicht innerhalb von {timeout} s erhalten")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class EinzelinstanzSperre:
+    """Verhindert, dass ein Skript mehrfach gleichzeitig läuft.
+
+    Die Sperrdatei enthält PID und Rechnername des Besitzers. Ist der Prozess
+    nicht mehr am Leben (z.B. nach einem Absturz), gilt die Sperre als veraltet
+    und wird übernommen.
+    """
+
+    def __init__(self, lock_datei):
+        """Initialisiert die Sperre.
+
+        Args:
+            lock_datei (str): Pfad zur Sperrdatei
+        """
+        self.lock_datei = lock_datei
+        self._datei = None
+
+    def __enter__(self):
+        if not self.erwerben():
+            raise SperreBelegtError(f"Eine andere Instanz läuft bereits ({self.lock_datei})")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.freigeben()
+        return False
+
+    def erwerben(self):
+        """Versucht die Sperre zu erhalten.
+
+        Returns:
+            bool: True, wenn die Sperre erhalten wurde
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_datei)), exist_ok=True)
+        if fcntl is not None:
+            # Der Kernel gibt die flock-Sperre beim Prozessende frei, eine nach
+            # einem Absturz verbliebene Sperrdatei blockiert daher nicht
+            f = open(self.lock_datei, "a+")
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.seek(0)
+                logger.warning(f"Sperre {self.lock_datei} ist belegt von {f.read().strip() or 'unbekannt'}")
+                f.close()
+                return False
+            f.seek(0)
+            vorheriger_besitzer = f.read().strip()
+            if vorheriger_besitzer:
+                # Beim regulären Freigeben wird die Datei geleert
+                logger.warning(f"Veraltete Sperre von {vorheriger_besitzer} in {self.lock_datei} übernommen")
+            f.seek(0)
+            f.truncate()
+            f.write(self._besitzer())
+            f.flush()
+            self._datei = f
+            return True
+
+        # Ohne fcntl: Sperrdatei exklusiv anlegen und veraltete Sperren erkennen
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_datei, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._ist_veraltet():
+                    return False
+                logger.warning(f"Veraltete Sperre {self.lock_datei} wird entfernt")
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self.lock_datei)
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(self._besitzer())
+            self._datei = True
+            return True
+        return False
+
+    def freigeben(self):
+        """Gibt die Sperre wieder frei"""
+        if self._datei is None:
+            return
+        if fcntl is not None:
+            self._datei.seek(0)
+            self._datei.truncate()
+            fcntl.flock(self._datei.fileno(), fcntl.LOCK_UN)
+            self._datei.close()
+        else:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.lock_datei)
+        self._datei = None
+
+    @staticmethod
+    def _besitzer():
+        """Beschreibt den aktuellen Prozess für die Sperrdatei"""
+        return f"{os.getpid()}@{socket.gethostname()}\n"
+
+    def _ist_veraltet(self):
+        """Prüft, ob der in der Sperrdatei eingetragene Prozess noch läuft"""
+        try:
+            with open(self.lock_datei, "r") as f:
+                inhalt = f.read().strip()
+            pid, rechner = inhalt.split("@", 1)
+            pid = int(pid)
+        except (OSError, ValueError):
+            return True
+        if rechner != socket.gethostname():
+            # Prozesse auf anderen Rechnern können nicht geprüft werden
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        except OSError:
+            return True
+        return False
+
+# Made with Bob
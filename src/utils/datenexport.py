@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Datenexport
+
+Generatoren zum Exportieren der gespeicherten Lehrgänge und der archivierten
+Benachrichtigungen. Alle Quellen werden datensatzweise gelesen, sodass auch
+große Datenbestände mit konstantem Speicherbedarf exportiert werden können.
+"""
+
+import os
+import sys
+import csv
+import gzip
+import json
+import time
+import logging
+
+from .aufbewahrung import lese_historie
+from .kurs_eintrag import KursEintrag
+from .termin_datum import parse_termin, parse_datum
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.Datenexport")
+
+TERMIN_FELDER = ["termin", "beginn", "ende", "kursname", "status", "ort", "benachrichtigt"]
+HISTORIE_FELDER = TERMIN_FELDER + ["archiviert_am"]
+ARCHIV_FELDER = ["gesendet_am", "betreff", "termin", "beginn", "ende", "kursname", "status", "ort", "datei"]
+TRENNLINIE = "-" * 41
+
+def iter_json_array(datei, puffer_groesse=65536):
+    """Liest die Elemente einer JSON-Liste nacheinander, ohne die ganze Datei zu laden.
+
+    Args:
+        datei (str): Pfad zur JSON-Datei mit einer Liste auf oberster Ebene
+        puffer_groesse (int): Anzahl der Zeichen, die je Lesevorgang gelesen werden
+
+    Yields:
+        Die einzelnen Elemente der Liste
+
+    Raises:
+        ValueError: Wenn die Datei keine gültige JSON-Liste enthält
+    """
+    decoder = json.JSONDecoder()
+    with open(datei, "r", encoding="utf-8") as f:
+        puffer = ""
+        pos = 0
+        ende_datei = False
+
+        def nachladen():
+            nonlocal puffer, pos, ende_datei
+            daten = f.read(puffer_groesse)
+            if not daten:
+                ende_datei = True
+            puffer = puffer[pos:] + daten
+            pos = 0
+
+        def ueberspringe_leerraum():
+            nonlocal pos
+            while True:
+                while pos < len(puffer) and puffer[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(puffer) or ende_datei:
+                    return
+                nachladen()
+
+        ueberspringe_leerraum()
+        if pos >= len(puffer) or puffer[pos] != "[":
+            raise ValueError(f"{datei} enthält keine JSON-Liste")
+        pos += 1
+
+        erstes = True
+        while True:
+            ueberspringe_leerraum()
+            if pos >= len(puffer):
+                raise ValueError(f"{datei} endet unerwartet")
+            if puffer[pos] == "]":
+                return
+            if not erstes:
+                if puffer[pos] != ",":
+                    raise ValueError(f"{datei}: Komma erwartet")
+                pos += 1
+                ueberspringe_leerraum()
+            erstes = False
+
+            while True:
+                try:
+                    element, neue_pos = decoder.raw_decode(puffer, pos)
+                except json.JSONDecodeError:
+                    if ende_datei:
+                        raise
+                    nachladen()
+                    continue
+                # Eine Zahl am Pufferende könnte abgeschnitten sein
+                if neue_pos >= len(puffer) and not ende_datei:
+                    nachladen()
+                    continue
+                break
+            pos = neue_pos
+            yield element
+
+def _datum_iso(datum):
+    return datum.isoformat() if datum else ""
+
+def _gueltige_eintraege(datensaetze, quelle):
+    """Wandelt Datensätze in KursEintrag-Objekte um und überspringt ungültige (wie lade_eintraege)
+
+    Yields:
+        tuple: (KursEintrag, ursprünglicher Datensatz)
+    """
+    uebersprungen = 0
+    for daten in datensaetze:
+        if isinstance(daten, dict) and "termin" in daten and "beschreibung" in daten:
+            yield KursEintrag.aus_dict(daten), daten
+        else:
+            uebersprungen += 1
+    if uebersprungen:
+        logger.warning(f"{uebersprungen} ungültige Einträge in {quelle} übersprungen")
+
+def quelle_termine(json_datei, gesendet_datei=None):
+    """Liefert die Lehrgänge aus der termine.json als Export-Datensätze.
+
+    Args:
+        json_datei (str): Pfad zur termine.json
+        gesendet_datei (str): Pfad zur last_sent.json; daraus wird das Feld
+            benachrichtigt bestimmt. Dafür wird nur die Menge der Schlüssel im
+            Speicher gehalten.
+
+    Yields:
+        dict: Datensatz mit den Feldern aus TERMIN_FELDER
+    """
+    if not os.path.exists(json_datei):
+        return
+    gesendet = set()
+    if gesendet_datei and os.path.exists(gesendet_datei):
+        for eintrag, _ in _gueltige_eintraege(iter_json_array(gesendet_datei), gesendet_datei):
+            gesendet.add(eintrag.schluessel)
+
+    for eintrag, _ in _gueltige_eintraege(iter_json_array(json_datei), json_datei):
+        beginn, ende = parse_termin(eintrag.termin)
+        yield {
+            "termin": eintrag.termin,
+            "beginn": _datum_iso(beginn),
+            "ende": _datum_iso(ende),
+            "kursname": eintrag.kursname,
+            "status": eintrag.status,
+            "ort": eintrag.ort,
+            "benachrichtigt": eintrag.schluessel in gesendet
+        }
+
+def quelle_historie(historie_datei):
+    """Liefert die in die Historie verschobenen Lehrgänge als Export-Datensätze.
+
+    Args:
+        historie_datei (str): Pfad zur komprimierten Historie (.jsonl.gz)
+
+    Yields:
+        dict: Datensatz mit den Feldern aus HISTORIE_FELDER
+    """
+    for eintrag, daten in _gueltige_eintraege(lese_historie(historie_datei), historie_datei):
+        beginn, ende = parse_termin(eintrag.termin)
+        yield {
+            "termin": eintrag.termin,
+            "beginn": _datum_iso(beginn),
+            "ende": _datum_iso(ende),
+            "kursname": eintrag.kursname,
+            "status": eintrag.status,
+            "ort": eintrag.ort,
+            "benachrichtigt": daten.get("benachrichtigt", False),
+            "archiviert_am": daten.get("archiviert_am", "")
+        }
+
+def quelle_archiv(archiv_dir):
+    """Liefert die Lehrgänge aus den archivierten Benachrichtigungen.
+
+    Jede Archivdatei wird zeilenweise gelesen; für jeden darin enthaltenen
+    Lehrgang wird ein Datensatz erzeugt.
+
+    Args:
+        archiv_dir (str): Verzeichnis mit den archivierten E-Mails
+
+    Yields:
+        dict: Datensatz mit den Feldern aus ARCHIV_FELDER
+    """
+    if not os.path.isdir(archiv_dir):
+        return
+    dateinamen = sorted(e.name for e in os.scandir(archiv_dir) if e.is_file() and e.name.endswith(".txt"))
+    for dateiname in dateinamen:
+        yield from _lese_archivdatei(os.path.join(archiv_dir, dateiname))
+
+def _lese_archivdatei(pfad):
+    """Liest die Lehrgänge aus einer archivierten E-Mail (Format von formatiere_eintrag_text)"""
+    betreff = ""
+    gesendet_am = ""
+    vorherige = ""
+    kurs = None
+    with open(pfad, "r", encoding="utf-8") as f:
+        for zeile in f:
+            zeile = zeile.rstrip("\n")
+            if zeile.startswith("Betreff: ") and not betreff:
+                betreff = zeile[len("Betreff: "):]
+            elif zeile.startswith("Datum: ") and not gesendet_am:
+                try:
+                    gesendet_am = time.strftime(
+                        "%Y-%m-%dT%H:%M:%S", time.strptime(zeile[len("Datum: "):], "%d.%m.%Y %H:%M:%S")
+                    )
+                except ValueError:
+                    gesendet_am = zeile[len("Datum: "):]
+            elif zeile == TRENNLINIE:
+                if kurs is None:
+                    # Die Zeile vor der ersten Trennlinie enthält den Kursnamen
+                    kurs = {"kursname": vorherige, "termin": "", "status": "", "ort": ""}
+                else:
+                    beginn, ende = parse_termin(kurs["termin"])
+                    yield {
+                        "gesendet_am": gesendet_am,
+                        "betreff": betreff,
+                        "termin": kurs["termin"],
+                        "beginn": _datum_iso(beginn),
+                        "ende": _datum_iso(ende),
+                        "kursname": kurs["kursname"],
+                        "status": kurs["status"],
+                        "ort": kurs["ort"],
+                        "datei": os.path.basename(pfad)
+                    }
+                    kurs = None
+            elif kurs is not None:
+                for feld, praefix in (("termin", "Termin: "), ("status", "Status: "), ("ort", "Ort: ")):
+                    if zeile.startswith(praefix):
+                        kurs[feld] = zeile[len(praefix):]
+            vorherige = zeile
+
+def filtere(datensaetze, von=None, bis=None, kursname=None, status=None, benachrichtigt=None):
+    """Filtert Export-Datensätze.
+
+    Args:
+        datensaetze (iterable): Datensätze einer Quelle
+        von (datetime.date): Lehrgang endet frühestens an diesem Tag
+        bis (datetime.date): Lehrgang beginnt spätestens an diesem Tag
+        kursname (str): Teilstring im Kursnamen (ohne Groß-/Kleinschreibung)
+        status (str): Exakter Status (ohne Groß-/Kleinschreibung)
+        benachrichtigt (bool): Nur (nicht) gemeldete Lehrgänge
+
+    Yields:
+        dict: Die passenden Datensätze
+    """
+    kursname = kursname.lower() if kursname else None
+    status = status.lower() if status else None
+    for datensatz in datensaetze:
+        if von or bis:
+            if not datensatz["beginn"]:
+                continue
+            if von and parse_datum(datensatz["ende"]) < von:
+                continue
+            if bis and parse_datum(datensatz["beginn"]) > bis:
+                continue
+        if kursname and kursname not in datensatz["kursname"].lower():
+            continue
+        if status and datensatz["status"].lower() != status:
+            continue
+        if benachrichtigt is not None and datensatz.get("benachrichtigt", True) != benachrichtigt:
+            continue
+        yield datensatz
+
+def oeffne_ausgabe(ziel, komprimiert):
+    """Öffnet die Ausgabedatei (oder stdout bei "-") als Textdatei, optional gzip-komprimiert"""
+    if ziel == "-":
+        if komprimiert:
+            return gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", newline="")
+        return open(sys.stdout.fileno(), "w", encoding="utf-8", newline="", closefd=False)
+    verzeichnis = os.path.dirname(os.path.abspath(ziel))
+    os.makedirs(verzeichnis, exist_ok=True)
+    if komprimiert:
+        return gzip.open(ziel, "wt", encoding="utf-8", newline="")
+    return open(ziel, "w", encoding="utf-8", newline="")
+
+def schreibe_export(datensaetze, ausgabe, ausgabeformat, felder):
+    """Schreibt die Datensätze fortlaufend als CSV oder NDJSON.
+
+    Args:
+        datensaetze (iterable): Zu schreibende Datensätze
+        ausgabe: Geöffnete Textdatei
+        ausgabeformat (str): "csv" oder "ndjson"
+        felder (list): Spalten (nur CSV)
+
+    Returns:
+        int: Anzahl der geschriebenen Datensätze
+    """
+    anzahl = 0
+    if ausgabeformat == "csv":
+        writer = csv.DictWriter(ausgabe, fieldnames=felder, extrasaction="ignore")
+        writer.writeheader()
+        for datensatz in datensaetze:
+            writer.writerow(datensatz)
+            anzahl += 1
+    elif ausgabeformat == "ndjson":
+        for datensatz in datensaetze:
+            ausgabe.write(json.dumps(datensatz, ensure_ascii=False))
+            ausgabe.write("\n")
+            anzahl += 1
+    else:
+        raise ValueError(f"Unbekanntes Format: {ausgabeformat}")
+    return anzahl
+
+# Made with Bob
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+iCalendar-Feed
+
+Diese Klasse erzeugt aus den gespeicherten Lehrgängen iCalendar-Dateien (.ics).
+Bereits erzeugte Ereignisse werden zwischengespeichert und nur neu erzeugt,
+wenn sich die Daten des Lehrgangs geändert haben.
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import logging
+
+from .dateisperre import schreibe_atomar
+from .termin_datum import parse_termin
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.ICalFeed")
+
+PRODID = "-//LehrgangsMelder//Lehrgaenge//DE"
+UID_DOMAIN = "lehrgangsmelder"
+
+def _escape(text):
+    """Maskiert Sonderzeichen in iCalendar-Textwerten (RFC 5545, 3.3.11)"""
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+def _falte(zeile):
+    """Bricht eine Inhaltszeile nach 75 Oktetten um (RFC 5545, 3.1)"""
+    daten = zeile.encode("utf-8")
+    if len(daten) <= 75:
+        return zeile
+    teile = []
+    start = 0
+    grenze = 75
+    while start < len(daten):
+        ende = min(start + grenze, len(daten))
+        # Nicht innerhalb eines UTF-8-Zeichens umbrechen
+        while ende < len(daten) and (daten[ende] & 0xC0) == 0x80:
+            ende -= 1
+        teile.append(daten[start:ende].decode("utf-8"))
+        start = ende
+        grenze = 74  # Folgezeilen beginnen mit einem Leerzeichen
+    return "\r\n ".join(teile)
+
+def erstelle_uid(eintrag):
+    """Erzeugt eine stabile UID aus dem Schlüssel des Lehrgangs"""
+    digest = hashlib.sha1(eintrag.schluessel.encode("utf-8")).hexdigest()
+    return f"{digest}@{UID_DOMAIN}"
+
+def _daten_hash(eintrag):
+    """Prüfsumme über die Felder, die in das Ereignis einfließen"""
+    inhalt = "\x1f".join((eintrag.termin, eintrag.beschreibung, eintrag.ort))
+    return hashlib.sha1(inhalt.encode("utf-8")).hexdigest()
+
+class ICalFeed:
+    """Erzeugt iCalendar-Dateien mit zwischengespeicherten Ereignissen."""
+
+    def __init__(self, cache_datei):
+        """Initialisiert den Feed-Generator.
+
+        Args:
+            cache_datei (str): JSON-Datei mit den bereits erzeugten Ereignissen
+        """
+        self.cache_datei = cache_datei
+        self._cache = self._lade_cache()
+        self.neu_erzeugt = 0
+        self.wiederverwendet = 0
+        self.entfernt = 0
+
+    def _lade_cache(self):
+        """Lädt den Ereignis-Cache oder gibt einen leeren Cache zurück"""
+        if not os.path.exists(self.cache_datei):
+            return {}
+        try:
+            with open(self.cache_datei, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ereignis-Cache {self.cache_datei} nicht lesbar, wird neu aufgebaut: {e}")
+            return {}
+
+    def speichere_cache(self):
+        """Speichert den Ereignis-Cache, sofern Ereignisse neu erzeugt oder entfernt wurden
+
+        Returns:
+            bool: True, wenn der Cache geschrieben wurde
+        """
+        if not self.neu_erzeugt and not self.entfernt:
+            return False
+        schreibe_atomar(self.cache_datei, json.dumps(self._cache, ensure_ascii=False))
+        return True
+
+    def ereignisse(self, eintraege):
+        """Liefert die VEVENT-Blöcke für die Einträge und aktualisiert den Cache.
+
+        Nicht mehr vorhandene Einträge werden aus dem Cache entfernt.
+
+        Args:
+            eintraege (list): KursEintrag-Objekte aus der termine.json
+
+        Returns:
+            list: Tupel (Eintrag, VEVENT-Text) in der Reihenfolge der Einträge
+        """
+        ergebnis = []
+        gesehen = set()
+        for eintrag in eintraege:
+            uid = erstelle_uid(eintrag)
+            if uid in gesehen:
+                continue
+            gesehen.add(uid)
+
+            daten_hash = _daten_hash(eintrag)
+            zwischengespeichert = self._cache.get(uid)
+            if zwischengespeichert and zwischengespeichert["hash"] == daten_hash:
+                self.wiederverwendet += 1
+                if zwischengespeichert["vevent"]:
+                    ergebnis.append((eintrag, zwischengespeichert["vevent"]))
+                continue
+
+            vevent = self._erzeuge_vevent(uid, eintrag)
+            self._cache[uid] = {"hash": daten_hash, "vevent": vevent}
+            self.neu_erzeugt += 1
+            if vevent:
+                ergebnis.append((eintrag, vevent))
+
+        for uid in [uid for uid in self._cache if uid not in gesehen]:
+            del self._cache[uid]
+            self.entfernt += 1
+        return ergebnis
+
+    @staticmethod
+    def _erzeuge_vevent(uid, eintrag):
+        """Erzeugt den VEVENT-Block eines Lehrgangs (leer, wenn kein Datum erkennbar ist)"""
+        beginn, ende = parse_termin(eintrag.termin)
+        if beginn is None:
+            return ""
+        # DTSTAMP bleibt stabil, solange sich der Lehrgang nicht ändert
+        zeitstempel = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        beschreibung = f"Termin: {eintrag.termin}\nStatus: {eintrag.status or 'unbekannt'}"
+        zeilen = [
+            "BEGIN:VEVENT",
+            f"UID:{uid}",
+            f"DTSTAMP:{zeitstempel}",
+            f"DTSTART;VALUE=DATE:{beginn.strftime('%Y%m%d')}",
+            # DTEND ist bei ganztägigen Ereignissen exklusiv
+            f"DTEND;VALUE=DATE:{(ende + datetime.timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_escape(eintrag.kursname)}",
+            f"DESCRIPTION:{_escape(beschreibung)}",
+            f"LOCATION:{_escape(eintrag.ort)}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+        return "".join(_falte(zeile) + "\r\n" for zeile in zeilen)
+
+    @staticmethod
+    def kalender(vevents, name):
+        """Setzt die VEVENT-Blöcke zu einem vollständigen Kalender zusammen"""
+        kopf = "".join(_falte(zeile) + "\r\n" for zeile in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{_escape(name)}",
+        ))
+        return kopf + "".join(vevents) + "END:VCALENDAR\r\n"
+
+    @staticmethod
+    def schreibe(datei, inhalt):
+        """Schreibt eine .ics-Datei atomar, sofern sich ihr Inhalt geändert hat.
+
+        Der ETag wird in einer Datei <datei>.etag daneben abgelegt.
+
+        Returns:
+            tuple: (ETag, True wenn die Datei geschrieben wurde)
+        """
+        etag = '"' + hashlib.sha1(inhalt.encode("utf-8")).hexdigest() + '"'
+        etag_datei = f"{datei}.etag"
+        if os.path.exists(datei) and os.path.exists(etag_datei):
+            with open(etag_datei, "r", encoding="utf-8") as f:
+                if f.read().strip() == etag:
+                    return etag, False
+        schreibe_atomar(datei, inhalt)
+        schreibe_atomar(etag_datei, etag + "\n")
+        return etag, True
+
+# Made with Bob
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Kurs-Eintrag
+
+Diese Klasse bildet einen gespeicherten Lehrgang ab. Sie wird von Monitor und
+Mail-Notifier gemeinsam verwendet und ist auf geringen Speicherverbrauch
+ausgelegt: Attribute liegen in __slots__, und die sich wiederholenden Texte
+(Ort, Status, Kursname, ...) werden internalisiert, sodass tausende Einträge
+sich dieselben String-Objekte teilen.
+"""
+
+import sys
+import json
+
+def normalisiere(text):
+    """Vereinheitlicht Texte für Vergleiche (Leerraum zusammenfassen, Kleinschreibung)"""
+    return " ".join((text or "").split()).lower()
+
+class KursEintrag:
+    """Ein Lehrgang aus der Lehrgangstabelle."""
+
+    __slots__ = ("termin", "beschreibung", "ort", "kursname", "status")
+
+    # Felder, die gespeichert werden; kursname und status werden aus der Beschreibung abgeleitet
+    GESPEICHERTE_FELDER = ("termin", "beschreibung", "ort")
+    FELDER = __slots__
+
+    def __init__(self, termin, beschreibung, ort):
+        """Initialisiert den Eintrag.
+
+        Args:
+            termin (str): Einzelner Termin oder Zeitraum ("10.10.2025 - 25.10.2025")
+            beschreibung (str): Kursname und Status ("Atemschutzgeräteträger - eingeladen")
+            ort (str): Veranstaltungsort mit Adresse
+        """
+        self.termin = sys.intern(termin)
+        self.beschreibung = sys.intern(beschreibung)
+        self.ort = sys.intern(ort)
+
+        # Extrahiere den Kursnamen und Status aus der Beschreibung
+        kursname = beschreibung
+        status = ""
+        if " - " in beschreibung:
+            teile = beschreibung.split(" - ")
+            kursname = teile[0]
+            status = teile[1]
+        self.kursname = sys.intern(kursname)
+        self.status = sys.intern(status)
+
+    @classmethod
+    def aus_dict(cls, daten):
+        """Erzeugt einen Eintrag aus einem gespeicherten Dictionary.
+
+        Gelesen werden sowohl das kompakte Format als auch ältere Einträge,
+        die zusätzlich kursname und status enthalten.
+        """
+        return cls(daten["termin"], daten["beschreibung"], daten.get("ort", ""))
+
+    def als_dict(self, vollstaendig=False):
+        """Wandelt den Eintrag in ein Dictionary um.
+
+        Args:
+            vollstaendig (bool): Auch die abgeleiteten Felder kursname und status ausgeben
+
+        Returns:
+            dict: Der Eintrag
+        """
+        felder = self.FELDER if vollstaendig else self.GESPEICHERTE_FELDER
+        return {feld: getattr(self, feld) for feld in felder}
+
+    @property
+    def schluessel(self):
+        """Eindeutiger Schlüssel des Lehrgangs aus Termin und Kursname (ohne Status)
+
+        So werden mehrere Lehrgänge desselben Typs mit unterschiedlichen Terminen
+        erkannt, unabhängig vom Status (geplant, eingeladen, etc.). Alle Skripte
+        verwenden diesen Schlüssel, damit der Abgleich überall gleich ausfällt.
+        """
+        return f"{normalisiere(self.termin)}|{normalisiere(self.kursname)}"
+
+    def __getitem__(self, feld):
+        # Erlaubt den Zugriff wie bisher bei Dictionaries, z.B. eintrag["termin"]
+        if feld not in self.FELDER:
+            raise KeyError(feld)
+        return getattr(self, feld)
+
+    def get(self, feld, standard=None):
+        """Liefert ein Feld oder den Standardwert (wie dict.get)"""
+        if feld not in self.FELDER:
+            return standard
+        return getattr(self, feld)
+
+    def _werte(self):
+        return (self.termin, self.beschreibung, self.ort)
+
+    def __eq__(self, other):
+        if not isinstance(other, KursEintrag):
+            return NotImplemented
+        return self._werte() == other._werte()
+
+    def __hash__(self):
+        return hash(self._werte())
+
+    def __repr__(self):
+        return f"KursEintrag(termin={self.termin!r}, beschreibung={self.beschreibung!r}, ort={self.ort!r})"
+
+def lade_eintraege(daten):
+    """Wandelt eine geladene JSON-Liste in KursEintrag-Objekte um (ungültige Einträge werden übersprungen)"""
+    return [
+        KursEintrag.aus_dict(eintrag) for eintrag in daten
+        if isinstance(eintrag, dict) and "termin" in eintrag and "beschreibung" in eintrag
+    ]
+
+def serialisiere(eintraege):
+    """Serialisiert Einträge kompakt als JSON-Liste mit einem Eintrag pro Zeile"""
+    if not eintraege:
+        return "[]\n"
+    zeilen = (
+        json.dumps(
+            eintrag.als_dict() if isinstance(eintrag, KursEintrag) else eintrag,
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        for eintrag in eintraege
+    )
+    return "[\n" + ",\n".join(zeilen) + "\n]\n"
+
+# Made with Bob
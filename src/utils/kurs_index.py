@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Kurs-Index
+
+Diese Klasse hält die gespeicherten Lehrgänge im Speicher und indiziert sie
+nach Kursname, Status, Ort und Datum, damit Abfragen nicht jedes Mal die
+komplette termine.json lesen müssen.
+"""
+
+import os
+import json
+import bisect
+import hashlib
+import datetime
+import logging
+import threading
+from collections import defaultdict
+
+from .kurs_eintrag import KursEintrag, normalisiere as _normalisiere
+from .termin_datum import parse_termin
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.KursIndex")
+
+class KursIndex:
+    """In-Memory-Index über die gespeicherten Lehrgänge."""
+
+    FELDER = ("kursname", "status", "ort")
+
+    def __init__(self, json_datei, pruef_intervall=1.0):
+        """Initialisiert den Index.
+
+        Args:
+            json_datei (str): Pfad zur termine.json
+            pruef_intervall (float): Mindestabstand in Sekunden zwischen zwei
+                Prüfungen, ob sich die Datei geändert hat
+        """
+        self.json_datei = json_datei
+        self.pruef_intervall = pruef_intervall
+        self.generation = 0
+        self._lock = threading.RLock()
+        self._signatur = None
+        self._letzte_pruefung = 0.0
+        self._eintraege = {}
+        self._position = {}
+        self._feld_index = {feld: defaultdict(set) for feld in self.FELDER}
+        self._tag_index = defaultdict(set)
+        self._zeitraeume = {}
+        self._beginn_liste = []
+        self._antwort_cache = {}
+
+    def __len__(self):
+        return len(self._eintraege)
+
+    def aktualisieren(self, erzwingen=False):
+        """Liest die JSON-Datei neu ein, falls sie sich seit dem letzten Laden geändert hat.
+
+        Es werden nur hinzugekommene, geänderte oder entfernte Einträge im Index
+        nachgezogen.
+
+        Args:
+            erzwingen (bool): Prüfintervall ignorieren
+
+        Returns:
+            bool: True, wenn sich der Index geändert hat
+        """
+        jetzt = datetime.datetime.now().timestamp()
+        if not erzwingen and jetzt - self._letzte_pruefung < self.pruef_intervall:
+            return False
+
+        with self._lock:
+            self._letzte_pruefung = jetzt
+            try:
+                stat = os.stat(self.json_datei)
+                signatur = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signatur = None
+            if signatur == self._signatur:
+                return False
+
+            daten = []
+            if signatur is not None:
+                try:
+                    with open(self.json_datei, "r", encoding="utf-8") as f:
+                        daten = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    # Datei wird möglicherweise gerade geschrieben, beim nächsten Mal erneut versuchen
+                    logger.warning(f"Konnte {self.json_datei} nicht lesen, behalte alten Stand: {e}")
+                    return False
+                if not isinstance(daten, list):
+                    daten = []
+
+            geaendert = self._uebernehmen(daten)
+            self._signatur = signatur
+            if geaendert:
+                self.generation += 1
+                self._antwort_cache.clear()
+                logger.info(f"Index aktualisiert: {len(self._eintraege)} Einträge (Generation {self.generation})")
+            return geaendert
+
+    def _uebernehmen(self, daten):
+        """Gleicht den Index mit den geladenen Daten ab"""
+        neue_eintraege = {}
+        neue_position = {}
+        for position, eintrag in enumerate(daten):
+            if not isinstance(eintrag, dict) or "termin" not in eintrag or "beschreibung" not in eintrag:
+                continue
+            eintrag = KursEintrag.aus_dict(eintrag)
+            key = eintrag.schluessel
+            neue_eintraege[key] = eintrag
+            neue_position[key] = position
+
+        geaendert = False
+        for key in [key for key in self._eintraege if key not in neue_eintraege]:
+            self._entfernen(key)
+            geaendert = True
+        for key, eintrag in neue_eintraege.items():
+            alt = self._eintraege.get(key)
+            if alt == eintrag:
+                continue
+            if alt is not None:
+                self._entfernen(key)
+            self._hinzufuegen(key, eintrag)
+            geaendert = True
+
+        if geaendert or neue_position != self._position:
+            self._position = neue_position
+            geaendert = True
+        return geaendert
+
+    def _hinzufuegen(self, key, eintrag):
+        """Nimmt einen Eintrag in alle Teilindizes auf"""
+        self._eintraege[key] = eintrag
+        for feld in self.FELDER:
+            self._feld_index[feld][_normalisiere(eintrag[feld])].add(key)
+
+        beginn, ende = parse_termin(eintrag.termin)
+        if beginn is None:
+            return
+        self._zeitraeume[key] = (beginn, ende)
+        bisect.insort(self._beginn_liste, (beginn, key))
+        tag = beginn
+        while tag <= ende:
+            self._tag_index[tag].add(key)
+            tag += datetime.timedelta(days=1)
+
+    def _entfernen(self, key):
+        """Entfernt einen Eintrag aus allen Teilindizes"""
+        eintrag = self._eintraege.pop(key)
+        for feld in self.FELDER:
+            index = self._feld_index[feld]
+            wert = _normalisiere(eintrag[feld])
+            index[wert].discard(key)
+            if not index[wert]:
+                del index[wert]
+
+        zeitraum = self._zeitraeume.pop(key, None)
+        if zeitraum is None:
+            return
+        beginn, ende = zeitraum
+        pos = bisect.bisect_left(self._beginn_liste, (beginn, key))
+        if pos < len(self._beginn_liste) and self._beginn_liste[pos] == (beginn, key):
+            del self._beginn_liste[pos]
+        tag = beginn
+        while tag <= ende:
+            self._tag_index[tag].discard(key)
+            if not self._tag_index[tag]:
+                del self._tag_index[tag]
+            tag += datetime.timedelta(days=1)
+
+    def suche(self, kursname=None, status=None, ort=None, datum=None, von=None, bis=None, text=None):
+        """Sucht Einträge anhand der übergebenen Filter.
+
+        Args:
+            kursname (str): Exakter Kursname (ohne Groß-/Kleinschreibung)
+            status (str): Exakter Status
+            ort (str): Exakter Ort
+            datum (datetime.date): Lehrgang findet an diesem Tag statt
+            von (datetime.date): Lehrgang endet frühestens an diesem Tag
+            bis (datetime.date): Lehrgang beginnt spätestens an diesem Tag
+            text (str): Teilstring in Beschreibung oder Ort
+
+        Returns:
+            list: Passende KursEintrag-Objekte in der Reihenfolge der JSON-Datei
+        """
+        with self._lock:
+            kandidaten = None
+            for feld, wert in (("kursname", kursname), ("status", status), ("ort", ort)):
+                if wert is None:
+                    continue
+                treffer = self._feld_index[feld].get(_normalisiere(wert), set())
+                kandidaten = set(treffer) if kandidaten is None else kandidaten & treffer
+
+            if datum is not None:
+                treffer = self._tag_index.get(datum, set())
+                kandidaten = set(treffer) if kandidaten is None else kandidaten & treffer
+
+            if von is not None or bis is not None:
+                ende_liste = len(self._beginn_liste)
+                if bis is not None:
+                    grenze = (bis + datetime.timedelta(days=1), "")
+                    ende_liste = bisect.bisect_left(self._beginn_liste, grenze)
+                treffer = {
+                    key for _, key in self._beginn_liste[:ende_liste]
+                    if von is None or self._zeitraeume[key][1] >= von
+                }
+                kandidaten = treffer if kandidaten is None else kandidaten & treffer
+
+            if kandidaten is None:
+                kandidaten = self._eintraege.keys()
+
+            if text:
+                suchtext = _normalisiere(text)
+                kandidaten = [
+                    key for key in kandidaten
+                    if suchtext in _normalisiere(self._eintraege[key].beschreibung)
+                    or suchtext in _normalisiere(self._eintraege[key].ort)
+                ]
+
+            return [self._eintraege[key] for key in sorted(kandidaten, key=self._position.__getitem__)]
+
+    def antwort(self, filter_werte):
+        """Liefert die serialisierte JSON-Antwort und deren ETag für eine Abfrage.
+
+        Antworten werden pro Index-Generation zwischengespeichert.
+
+        Args:
+            filter_werte (dict): Filter wie bei suche()
+
+        Returns:
+            tuple: (body als bytes, ETag)
+        """
+        cache_key = tuple(sorted((k, str(v)) for k, v in filter_werte.items() if v is not None))
+        with self._lock:
+            zwischengespeichert = self._antwort_cache.get(cache_key)
+            if zwischengespeichert is not None:
+                return zwischengespeichert
+
+            treffer = self.suche(**filter_werte)
+            body = json.dumps(
+                [eintrag.als_dict(vollstaendig=True) for eintrag in treffer],
+                ensure_ascii=False
+            ).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            # Cache begrenzen, damit beliebige Abfragen den Speicher nicht füllen
+            if len(self._antwort_cache) >= 1024:
+                self._antwort_cache.clear()
+            self._antwort_cache[cache_key] = (body, etag)
+            return body, etag
+
+# Made with Bob
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Profiling
+
+Optionales Profiling der Skripte nach Verarbeitungsschritten (Stufen). Ist das
+Profiling nicht aktiviert, wird ein Platzhalter verwendet, dessen Stufen nichts
+tun, sodass im Normalbetrieb kein Mehraufwand entsteht.
+
+Aktivierung über --profile (bzw. --profile-memory für Speicher-Snapshots) oder
+die Umgebungsvariablen PROFILE=True und PROFILE_MEMORY=True.
+"""
+
+import os
+import io
+import time
+import pstats
+import cProfile
+import logging
+import argparse
+import datetime
+import contextlib
+import tracemalloc
+from collections import defaultdict
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.Profiling")
+
+PROFILE_DIR = "logs/profile"
+
+class _KeinProfiler:
+    """Platzhalter, wenn das Profiling deaktiviert ist."""
+
+    aktiv = False
+    _KONTEXT = contextlib.nullcontext()
+
+    def stufe(self, name, speicher=False):
+        return self._KONTEXT
+
+    def abschliessen(self):
+        return None
+
+KEIN_PROFILER = _KeinProfiler()
+
+class Profiler:
+    """Sammelt cProfile-Statistiken und optional tracemalloc-Snapshots je Stufe."""
+
+    aktiv = True
+
+    def __init__(self, name, ausgabe_dir=PROFILE_DIR, speicher=False, top_n=20):
+        """Initialisiert den Profiler.
+
+        Args:
+            name (str): Name des Skripts, wird für die Dateinamen verwendet
+            ausgabe_dir (str): Verzeichnis für die Ausgabedateien
+            speicher (bool): tracemalloc-Snapshots für Stufen mit speicher=True erstellen
+            top_n (int): Anzahl der Einträge in den Berichten
+        """
+        self.name = name
+        self.ausgabe_dir = ausgabe_dir
+        self.speicher = speicher
+        self.top_n = top_n
+        self.zeitstempel = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._profile = {}
+        self._dauer = defaultdict(float)
+        self._speicher_berichte = []
+        self._aktive_stufe = None
+
+    @contextlib.contextmanager
+    def stufe(self, name, speicher=False):
+        """Profiliert den eingeschlossenen Block als Stufe.
+
+        Wird dieselbe Stufe mehrfach durchlaufen, werden die Statistiken
+        zusammengefasst. Verschachtelte Stufen werden der äußeren zugerechnet.
+
+        Args:
+            name (str): Name der Stufe
+            speicher (bool): Speicher-Snapshot vor und nach der Stufe erstellen
+        """
+        if self._aktive_stufe is not None:
+            yield
+            return
+
+        snapshot_vorher = None
+        if self.speicher and speicher:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            snapshot_vorher = tracemalloc.take_snapshot()
+
+        profil = self._profile.setdefault(name, cProfile.Profile())
+        self._aktive_stufe = name
+        start = time.perf_counter()
+        profil.enable()
+        try:
+            yield
+        finally:
+            profil.disable()
+            self._dauer[name] += time.perf_counter() - start
+            self._aktive_stufe = None
+            if snapshot_vorher is not None:
+                snapshot_nachher = tracemalloc.take_snapshot()
+                self._speicher_berichte.append((name, snapshot_vorher, snapshot_nachher))
+
+    def _datei(self, suffix):
+        """Pfad einer Ausgabedatei"""
+        return os.path.join(self.ausgabe_dir, f"{self.name}_{self.zeitstempel}{suffix}")
+
+    def abschliessen(self):
+        """Schreibt .pstats je Stufe, eine Collapsed-Stack-Datei und ggf. den Speicherbericht.
+
+        Returns:
+            list: Pfade der geschriebenen Dateien
+        """
+        os.makedirs(self.ausgabe_dir, exist_ok=True)
+        dateien = []
+        collapsed = defaultdict(float)
+
+        for name, profil in self._profile.items():
+            stats = pstats.Stats(profil)
+            datei = self._datei(f"_{name}.pstats")
+            stats.dump_stats(datei)
+            dateien.append(datei)
+            _sammle_stacks(stats, name, collapsed)
+
+            ausgabe = io.StringIO()
+            pstats.Stats(profil, stream=ausgabe).sort_stats("cumulative").print_stats(self.top_n)
+            logger.info(f"Profil Stufe '{name}': {self._dauer[name]:.3f} s\n{ausgabe.getvalue()}")
+
+        if collapsed:
+            datei = self._datei(".collapsed")
+            with open(datei, "w", encoding="utf-8") as f:
+                for stack, sekunden in sorted(collapsed.items()):
+                    mikrosekunden = int(sekunden * 1_000_000)
+                    if mikrosekunden > 0:
+                        f.write(f"{stack} {mikrosekunden}\n")
+            dateien.append(datei)
+
+        if self._speicher_berichte:
+            datei = self._datei("_speicher.txt")
+            with open(datei, "w", encoding="utf-8") as f:
+                for name, vorher, nachher in self._speicher_berichte:
+                    f.write(self._speicher_bericht(name, vorher, nachher))
+            dateien.append(datei)
+            tracemalloc.stop()
+
+        logger.info(f"Profiling-Ergebnisse gespeichert: {', '.join(dateien)}")
+        return dateien
+
+    def _speicher_bericht(self, name, vorher, nachher):
+        """Erstellt den Top-N-Bericht der Speicherzuwächse einer Stufe"""
+        filter_ = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        unterschiede = nachher.filter_traces(filter_).compare_to(vorher.filter_traces(filter_), "lineno")
+        gesamt = sum(eintrag.size_diff for eintrag in unterschiede)
+        zeilen = [f"=== Stufe '{name}': {gesamt / 1024:+.1f} KiB ===\n"]
+        for eintrag in unterschiede[:self.top_n]:
+            zeilen.append(f"{eintrag}\n")
+        zeilen.append("\n")
+        return "".join(zeilen)
+
+def _funktionsname(funktion):
+    """Beschriftung einer Funktion im Collapsed-Stack-Format"""
+    datei, zeile, name = funktion
+    if datei == "~":
+        beschriftung = name
+    else:
+        beschriftung = f"{name} ({os.path.basename(datei)}:{zeile})"
+    return beschriftung.replace(";", ",").replace(" ", "_")
+
+def _sammle_stacks(stats, stufe, collapsed, max_tiefe=64):
+    """Leitet aus dem cProfile-Aufrufgraphen Collapsed-Stacks für Flamegraphs ab.
+
+    cProfile speichert nur Aufrufer-Aufgerufener-Kanten. Die Eigenzeit einer
+    Funktion wird daher anteilig nach der kumulierten Zeit der jeweiligen Kante
+    auf die Pfade verteilt.
+    """
+    eintraege = stats.stats
+    aufgerufene = defaultdict(dict)
+    for funktion, (_, _, _, _, aufrufer) in eintraege.items():
+        for aufrufende, kante in aufrufer.items():
+            aufgerufene[aufrufende][funktion] = kante[3]
+
+    def besuche(funktion, pfad, anteil, besucht):
+        collapsed[pfad] += eintraege[funktion][2] * anteil
+        if len(besucht) >= max_tiefe:
+            return
+        for ziel, kanten_zeit in aufgerufene[funktion].items():
+            if ziel in besucht or ziel not in eintraege:
+                continue
+            ziel_gesamt = eintraege[ziel][3]
+            if ziel_gesamt <= 0:
+                continue
+            ziel_anteil = anteil * min(kanten_zeit / ziel_gesamt, 1.0)
+            if ziel_anteil * ziel_gesamt < 1e-6:
+                continue
+            besuche(ziel, f"{pfad};{_funktionsname(ziel)}", ziel_anteil, besucht | {ziel})
+
+    # Aufrufe aus dem Profiler selbst (Betreten/Verlassen der Stufe) nicht darstellen
+    eigene_dateien = (os.path.abspath(__file__), os.path.abspath(contextlib.__file__))
+    wurzeln = [
+        funktion for funktion, werte in eintraege.items()
+        if not werte[4] and os.path.abspath(funktion[0]) not in eigene_dateien
+    ]
+    for wurzel in wurzeln:
+        besuche(wurzel, f"{stufe};{_funktionsname(wurzel)}", 1.0, {wurzel})
+
+def ergaenze_profiling_optionen(parser):
+    """Registriert --profile, --profile-memory und --profile-top an einem Parser.
+
+    Für Skripte, die ihre Argumente mit parse_args() vollständig prüfen und
+    daher die Profiling-Optionen selbst kennen müssen.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser des Skripts
+    """
+    gruppe = parser.add_argument_group("Profiling")
+    gruppe.add_argument("--profile", action="store_true", help="Laufzeit je Stufe profilieren")
+    gruppe.add_argument("--profile-memory", action="store_true",
+                        help="Zusätzlich Speicher-Snapshots je Stufe erstellen")
+    gruppe.add_argument("--profile-top", type=int, default=None,
+                        help="Anzahl der Einträge in den Berichten (Standard: PROFILE_TOP bzw. 20)")
+
+def erstelle_profiler(name, argv=None):
+    """Erstellt anhand der Kommandozeile und Umgebung einen Profiler oder den Platzhalter.
+
+    Andere Kommandozeilenargumente werden ignoriert.
+
+    Args:
+        name (str): Name des Skripts
+        argv (list): Argumente (Standard: sys.argv[1:])
+
+    Returns:
+        Profiler oder KEIN_PROFILER
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    ergaenze_profiling_optionen(parser)
+    argumente, _ = parser.parse_known_args(argv)
+
+    speicher = argumente.profile_memory or os.getenv("PROFILE_MEMORY", "False").lower() == "true"
+    aktiv = argumente.profile or speicher or os.getenv("PROFILE", "False").lower() == "true"
+    if not aktiv:
+        return KEIN_PROFILER
+
+    top_n = argumente.profile_top or int(os.getenv("PROFILE_TOP", "20"))
+    ausgabe_dir = os.getenv("PROFILE_DIR", PROFILE_DIR)
+    logger.info(f"Profiling aktiviert (Speicher-Snapshots: {'ja' if speicher else 'nein'}), Ausgabe in {ausgabe_dir}")
+    return Profiler(name, ausgabe_dir=ausgabe_dir, speicher=speicher, top_n=top_n)
+
+# Made with Bob
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Termin-Datum
+
+Hilfsfunktionen zum Auswerten der Terminangaben aus der Lehrgangstabelle
+(z.B. "10.10.2025" oder "10.10.2025 - 25.10.2025").
+"""
+
+import re
+import datetime
+
+DATUM_MUSTER = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})")
+
+def parse_termin(termin):
+    """Ermittelt Beginn und Ende eines Termins.
+
+    Args:
+        termin (str): Terminangabe, einzelnes Datum oder Zeitraum
+
+    Returns:
+        tuple: (beginn, ende) als datetime.date oder (None, None), wenn
+        kein gültiges Datum enthalten ist
+    """
+    daten = []
+    for tag, monat, jahr in DATUM_MUSTER.findall(termin or ""):
+        try:
+            daten.append(datetime.date(int(jahr), int(monat), int(tag)))
+        except ValueError:
+            continue
+    if not daten:
+        return None, None
+    # Der Monitor sortiert die Termine als Text, daher nicht auf die Reihenfolge verlassen
+    return min(daten), max(daten)
+
+def parse_datum(text):
+    """Wandelt ein Datum im Format TT.MM.JJJJ oder JJJJ-MM-TT in ein datetime.date um.
+
+    Args:
+        text (str): Datumsangabe
+
+    Returns:
+        datetime.date: Das Datum
+
+    Raises:
+        ValueError: Wenn das Datum nicht gelesen werden kann
+    """
+    text = (text or "").strip()
+    for muster in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.datetime.strptime(text, muster).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Ungültiges Datum: {text!r}")
+
+# Made with Bob
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Zeilen-Cache
+
+Diese Klasse merkt sich für jede Tabellenzeile der Lehrgangsseite die bereits
+extrahierten Einträge, damit unveränderte Zeilen beim nächsten Lauf nicht
+erneut ausgewertet werden müssen.
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+from .dateisperre import schreibe_atomar
+from .kurs_eintrag import lade_eintraege
+
+# Logger konfigurieren
+logger = logging.getLogger("WebsiteMonitor.ZeilenCache")
+
+class ZeilenCache:
+    """Persistenter Cache von Zeilen-Fingerabdruck auf extrahierte Einträge."""
+
+    VERSION = 2
+
+    def __init__(self, cache_datei, suchbegriffe):
+        """Initialisiert den Cache.
+
+        Args:
+            cache_datei (str): JSON-Datei, in der der Cache gespeichert wird
+            suchbegriffe (list): Aktuelle Suchbegriffe; zwischengespeicherte
+                Trefferergebnisse gelten nur für dieselben Suchbegriffe
+        """
+        self.cache_datei = cache_datei
+        self.signatur = "|".join(begriff.lower() for begriff in suchbegriffe)
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self._zeilen = {}
+        self._gesehen = set()
+        self._suchbegriffe_gleich = False
+        self._laden()
+
+    @staticmethod
+    def fingerabdruck(markup):
+        """Berechnet den Fingerabdruck einer Zeile aus ihrem HTML-Markup"""
+        return hashlib.sha1(markup.encode("utf-8")).hexdigest()
+
+    def _laden(self):
+        """Lädt den Cache aus der Datei, bei Fehlern wird mit leerem Cache begonnen"""
+        if not os.path.exists(self.cache_datei):
+            return
+        try:
+            with open(self.cache_datei, "r", encoding="utf-8") as f:
+                daten = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Zeilen-Cache {self.cache_datei} nicht lesbar, beginne leer: {e}")
+            return
+        if not isinstance(daten, dict) or daten.get("version") != self.VERSION:
+            return
+        self._zeilen = {
+            fingerabdruck: {"eintraege": lade_eintraege(zeile["eintraege"]), "treffer": zeile["treffer"]}
+            for fingerabdruck, zeile in daten.get("zeilen", {}).items()
+        }
+        self._suchbegriffe_gleich = daten.get("suchbegriffe") == self.signatur
+
+    def holen(self, fingerabdruck):
+        """Liefert den zwischengespeicherten Eintrag einer Zeile.
+
+        Returns:
+            tuple: (eintraege, treffer) oder None, wenn die Zeile unbekannt ist.
+            treffer ist None, wenn er für andere Suchbegriffe berechnet wurde.
+        """
+        self._gesehen.add(fingerabdruck)
+        zeile = self._zeilen.get(fingerabdruck)
+        if zeile is None:
+            self.fehlschlaege += 1
+            return None
+        self.treffer += 1
+        return zeile["eintraege"], zeile["treffer"] if self._suchbegriffe_gleich else None
+
+    def ablegen(self, fingerabdruck, eintraege, treffer):
+        """Speichert die extrahierten Einträge und das Trefferergebnis einer Zeile.
+
+        Wird auch für bekannte Zeilen aufgerufen, deren Trefferergebnis wegen
+        geänderter Suchbegriffe neu berechnet wurde.
+        """
+        self._gesehen.add(fingerabdruck)
+        self._zeilen[fingerabdruck] = {"eintraege": eintraege, "treffer": treffer}
+
+    def speichern(self):
+        """Entfernt Zeilen, die in diesem Lauf nicht mehr vorkamen, und speichert den Cache.
+
+        Returns:
+            int: Anzahl der entfernten Zeilen
+        """
+        if not self._gesehen:
+            # Cache wurde in diesem Lauf nicht genutzt, bestehende Zeilen behalten
+            return 0
+        veraltet = [fingerabdruck for fingerabdruck in self._zeilen if fingerabdruck not in self._gesehen]
+        for fingerabdruck in veraltet:
+            del self._zeilen[fingerabdruck]
+        daten = {
+            "version": self.VERSION,
+            "suchbegriffe": self.signatur,
+            "zeilen": {
+                fingerabdruck: {
+                    "eintraege": [eintrag.als_dict() for eintrag in zeile["eintraege"]],
+                    "treffer": zeile["treffer"]
+                }
+                for fingerabdruck, zeile in self._zeilen.items()
+            }
+        }
+        schreibe_atomar(self.cache_datei, json.dumps(daten, ensure_ascii=False))
+        return len(veraltet)
+
+    def statistik(self):
+        """Gibt Treffer, Fehlschläge und Trefferquote des Laufs zurück"""
+        gesamt = self.treffer + self.fehlschlaege
+        quote = (self.treffer / gesamt * 100) if gesamt else 0.0
+        return self.treffer, self.fehlschlaege, quote
+
+# Made with Bob